@@ -1,27 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status, FastAPI, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, FastAPI, Response
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, NamedTuple
 from fastapi import FastAPI
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.datastructures import MutableHeaders
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from zoneinfo import ZoneInfo
+from datetime import date, datetime, time as dtime
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+import asyncio
+import binascii
+import json
+import os
+from time import perf_counter
+from contextlib import asynccontextmanager
+import logging
+import metrics
+from email.utils import format_datetime, parsedate_to_datetime
 
 from base import (
     get_session,
+    get_read_session,
+    get_read_session_cm,
+    get_stream_session_cm,
     User,
     Event,
     Contact,
-    Team,
     EventInvitation,
-    TeamMember,
-    verify_user,
-    get_user_by_id,
+    get_user_by_email,
+    get_user_identity,
+    update_user_timezone,
+    user_identity_cache,
+    UserIdentity,
+    password_pool,
+    db_pool_stats,
+    dispose_async_engine,
+    PasswordPoolBusy,
+    password_needs_rehash,
+    update_password_hash,
+    calibrate_bcrypt_rounds,
     create_user, 
     send_contact_request,
-    list_pending_received_requests,
     accept_contact_request,
     reject_contact_request,
-    list_contacts,
+    list_contacts_with_users,
+    list_pending_received_requests_with_senders,
     remove_contact,
     create_team,
     update_team,
@@ -29,17 +55,21 @@ from base import (
     list_teams_created_by_user,
     list_teams_user_is_in,
     get_team_by_id,
-    list_pending_team_invites,
     reject_team_invite,
     accept_team_invite,
     invite_user_to_team,
-    list_team_members,
+    list_team_members_with_users,
+    list_pending_team_invites_with_teams,
     remove_user_from_team,
     create_event as create_event_db,
-    invite_team_to_event,
-    auto_invite_team_members,
-    search_user_contacts_by_query,
-    search_user_teams_by_query,
+    bulk_invite_to_event,
+    list_invitees_by_invitation_ids,
+    list_invitees_for_events,
+    list_invitations_page,
+    list_owned_events_page,
+    PageKey,
+    typeahead_contacts,
+    typeahead_teams,
     get_event_by_id,
     invite_user_to_event,
     delete_event,
@@ -47,8 +77,32 @@ from base import (
     reject_event_invite,
     get_or_create_calendar_token,
     get_user_by_calendar_token,
-    list_events_for_calendar,
-    generate_ics_for_events,
+    get_invite_link,
+    redeem_invite_link,
+    invite_link_cache,
+    iter_events_for_calendar,
+    list_calendar_range,
+    iter_ics_for_events,
+    get_calendar_feed_version,
+    DB_ASYNC,
+    get_async_read_session,
+    get_async_read_session_cm,
+    get_async_stream_session_cm,
+    get_user_identity_async,
+    get_user_by_calendar_token_async,
+    get_calendar_feed_version_async,
+    aiter_events_for_calendar,
+    aiter_ics_for_events,
+    calendar_feed_window,
+    ics_feed_cache,
+    get_badge_counts,
+    get_badge_counts_async,
+    invalidate_badge_counts,
+    BADGE_COUNTS_CACHE_TTL,
+    notification_broker,
+    StreamLimitReached,
+    QueryStats,
+    collect_query_stats,
 )
 from schemas import (
     EventOut,
@@ -70,9 +124,13 @@ from schemas import (
     SimpleUserOut,
     EventInviteUserRequest,
     TimezoneUpdate,
-    
+    CalendarEventOut,
+    BadgeCounts,
+    DashboardOut,
 )
 
+logger = logging.getLogger("eventease.api")
+
 router = APIRouter(prefix="/api", tags=["events"])
 auth_router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -82,10 +140,7 @@ auth_router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
 
-def get_current_user(
-    request: Request,
-    db: Session = Depends(get_session),
-) -> User:
+def get_current_user(request: Request) -> UserIdentity:
     user_id = request.session.get("user_id")
     if not user_id:
         raise HTTPException(
@@ -93,7 +148,11 @@ def get_current_user(
             detail="Not authenticated",
         )
 
-    user = get_user_by_id(db, user_id)
+    # Cache hit: sin sesión de BD
+    user = user_identity_cache.get(user_id)
+    if user is None:
+        with get_read_session_cm() as db:
+            user = get_user_identity(db, user_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -107,24 +166,22 @@ def get_current_user(
 def update_my_timezone(
     data: TimezoneUpdate,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     try:
         ZoneInfo(data.timezone)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid timezone")
 
-    current_user.timezone = data.timezone
-    db.flush()
-    db.refresh(current_user)
-    return {"timezone": current_user.timezone}
+    user = update_user_timezone(db, current_user.id, data.timezone)
+    return {"timezone": user.timezone}
 
 
 @router.get("/calendar/ics-url")
 def get_calendar_ics_url(
     request: Request,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     """
     Devuelve la URL pública de tu feed ICS para pegar en Google Calendar.
@@ -140,71 +197,182 @@ def get_calendar_ics_url(
 
     return {"ics_url": ics_url}
 
+CALENDAR_RANGE_MAX_DAYS = 366
+
+
+@router.get("/calendar/range", response_model=list[CalendarEventOut])
+def get_calendar_range(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    include_pending: bool = False,
+    db: Session = Depends(get_read_session),
+    current_user: UserIdentity = Depends(get_current_user),
+):
+    """
+    Eventos propios + invitaciones aceptadas entre `from` y `to` (inclusive),
+    para que la vista mensual no tenga que cargar todo el historial.
+    """
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (to_date - from_date).days > CALENDAR_RANGE_MAX_DAYS:
+        raise HTTPException(status_code=400, detail="Date range too large")
+
+    rows = list_calendar_range(db, current_user.id, from_date, to_date, include_pending)
+
+    return [
+        CalendarEventOut(
+            id=ev.id,
+            title=ev.title,
+            date=ev.date,
+            time=ev.time,
+            endtime=ev.endtime,
+            location=ev.location,
+            description=ev.description,
+            host=host_name,
+            source=source,
+            rsvp=rsvp,
+        )
+        for ev, source, rsvp, host_name in rows
+    ]
+
+
+def _calendar_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    # If-None-Match tiene prioridad sobre If-Modified-Since (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        return last_modified <= since
+
+    return False
+
+
+def _calendar_headers(etag: str, last_modified: datetime) -> dict:
+    return {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+
+
 @router.get("/calendar/{token}.ics")
 def calendar_feed(
     token: str,
-    db: Session = Depends(get_session),
+    request: Request,
+    db: Session = Depends(get_read_session),
 ):
     user = get_user_by_calendar_token(db, token)
     if user is None:
         raise HTTPException(status_code=404, detail="Calendar not found")
 
-    events = list_events_for_calendar(db, user.id)
+    start, end = calendar_feed_window()
+    etag, last_modified = get_calendar_feed_version(db, user, start, end)
+    headers = _calendar_headers(etag, last_modified)
 
-    ics_str = generate_ics_for_events(events, timezone_name=user.timezone)
+    if _calendar_not_modified(request, etag, last_modified):
+        metrics.ics_not_modified_total.inc()
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
-    return Response(content=ics_str, media_type="text/calendar")
+    cached = ics_feed_cache.get(user.id, etag)
+    if cached is not None:
+        metrics.ics_feeds_served_total.inc(source="cache")
+        return Response(content=cached, media_type="text/calendar", headers=headers)
+
+    user_id, timezone_name = user.id, user.timezone
+
+    def body():
+        # Sesión propia: el stream sigue leyendo después de que el handler retorna
+        with get_stream_session_cm() as stream_db:
+            events = iter_events_for_calendar(stream_db, user_id, start, end)
+            chunks = iter_ics_for_events(events, timezone_name=timezone_name)
+            yield from ics_feed_cache.stream_through(user_id, etag, chunks)
+
+    metrics.ics_feeds_served_total.inc(source="stream")
+    return StreamingResponse(body(), media_type="text/calendar", headers=headers)
 
 
 @router.post("/invite-links/{token}/accept", response_model=InvitationOut)
 def accept_invite_by_token(
     token: str,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     """
     Acepta un link de invitación público (/invite/{token}) y crea
     una EventInvitation para el usuario actual si no existe.
     """
-    full_path = f"/invite/{token}"
-
-    # 1) Buscar el evento por event_url
-    event = db.query(Event).filter(Event.event_url == full_path).first()
-    if event is None:
+    # 1) Buscar el link por token (índice único + caché en proceso)
+    link = get_invite_link(db, token)
+    if link is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Invite link not found",
         )
 
+    if link.expires_at is not None and link.expires_at <= datetime.utcnow():
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Invite link expired",
+        )
+
     # 2) Si el owner abre su propio link, no tiene mucho sentido
-    if event.owner_id == current_user.id:
+    if link.owner_id == current_user.id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Owner cannot use their own invite link",
         )
 
-    # 3) Ver si ya existe una invitación para este usuario
+    # 3) Evento + nombre del host en un solo query
+    row = (
+        db.query(Event, User.name)
+        .join(User, User.id == Event.owner_id)
+        .filter(Event.id == link.event_id)
+        .first()
+    )
+    if row is None:
+        # El evento se borró en otro worker y la caché aún tenía el link
+        invite_link_cache.invalidate(token)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Invite link not found",
+        )
+    event, host_name = row
+    host_name = host_name or "—"
+
+    # 4) Ver si ya existe una invitación para este usuario
     invitation = (
         db.query(EventInvitation)
         .filter(
-            EventInvitation.event_id == event.id,
+            EventInvitation.event_id == link.event_id,
             EventInvitation.user_id == current_user.id,
         )
         .first()
     )
 
     if invitation is None:
+        # Solo un canje nuevo cuenta como uso del link
+        if not redeem_invite_link(db, link.link_id):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Invite link is no longer valid",
+            )
+
         # Crear invitación pendiente
         invitation = invite_user_to_event(
             db=db,
-            event_id=event.id,
+            event_id=link.event_id,
             user_id=current_user.id,
         )
 
-    # 4) Obtener host (owner) para el campo host
-    host_user = db.query(User).filter(User.id == event.owner_id).first()
-    host_name = host_user.name if host_user else "—"
-
     # 5) Devolver en el mismo formato que /api/my-invitations
     return InvitationOut(
         id=invitation.id,
@@ -220,7 +388,7 @@ def accept_invite_by_token(
 def accept_event_invitation_route(
     invitation_id: int,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     # Buscar la invitación
     invitation = (
@@ -251,7 +419,7 @@ def accept_event_invitation_route(
 def reject_event_invitation_route(
     invitation_id: int,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     invitation = (
         db.query(EventInvitation)
@@ -281,7 +449,7 @@ def reject_event_invitation_route(
 def delete_event_invitation_route(
     invitation_id: int,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     invitation = (
         db.query(EventInvitation)
@@ -294,6 +462,8 @@ def delete_event_invitation_route(
 
     db.delete(invitation)
     db.flush()
+    ics_feed_cache.invalidate(current_user.id)
+    invalidate_badge_counts(db, current_user.id)
     return
 
 
@@ -301,7 +471,7 @@ def delete_event_invitation_route(
 def create_team_route(
     data: TeamCreate,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     try:
         team = create_team(
@@ -317,16 +487,16 @@ def create_team_route(
 
 @router.get("/teams/owned", response_model=list[TeamOut])
 def list_owned_teams(
-    db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_session),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     return list_teams_created_by_user(db, owner_id=current_user.id)
 
 
 @router.get("/teams/mine", response_model=list[TeamOut])
 def list_member_teams(
-    db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_session),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     return list_teams_user_is_in(db, user_id=current_user.id)
 
@@ -334,7 +504,7 @@ def list_member_teams(
 def accept_team_invite_route(
     team_id: int,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     try:
         updated = accept_team_invite(
@@ -351,7 +521,7 @@ def invite_user_to_team_route(
     team_id: int,
     data: TeamInviteRequest,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     # Verificar que el equipo exista
     team = get_team_by_id(db, team_id=team_id)
@@ -396,17 +566,18 @@ def invite_user_to_team_route(
 
 @router.get("/teams/invitations", response_model=list[TeamInvitationOut])
 def list_team_invitations(
-    db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_session),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
-    rows = list_pending_team_invites(db, current_user.id)
-    results: list[TeamInvitationOut] = []
+    return _team_invitations_out(db, current_user.id)
 
-    for tm in rows:
-        team = db.query(Team).filter(Team.id == tm.team_id).first()
-        if not team:
-            continue
 
+def _team_invitations_out(db: Session, user_id: int) -> list[TeamInvitationOut]:
+    # (TeamMember, Team) en un solo JOIN
+    rows = list_pending_team_invites_with_teams(db, user_id)
+    results: list[TeamInvitationOut] = []
+
+    for tm, team in rows:
         team_out = TeamOut.model_validate(team, from_attributes=True)
 
         results.append(
@@ -424,7 +595,7 @@ def list_team_invitations(
 def leave_or_remove_myself(
     team_id: int,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     return remove_user_from_team(db, team_id, current_user.id)
 
@@ -435,7 +606,7 @@ def remove_team_member_route(
     team_id: int,
     user_id: int,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     team = get_team_by_id(db, team_id=team_id)
     if team is None:
@@ -462,18 +633,14 @@ def remove_team_member_route(
             detail="El creador debe eliminar el equipo para salir",
         )
 
-    membership = (
-        db.query(TeamMember)
-        .filter(TeamMember.team_id == team_id, TeamMember.user_id == user_id)
-        .first()
-    )
-    if membership is None:
+    try:
+        remove_user_from_team(db, team_id, user_id)
+    except ValueError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Member not found in team",
         )
 
-    db.delete(membership)
     db.flush()
     return
 
@@ -481,8 +648,8 @@ def remove_team_member_route(
 @router.get("/teams/{team_id}/members", response_model=list[TeamMemberOut])
 def get_team_members_route(
     team_id: int,
-    db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_session),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     team = get_team_by_id(db, team_id=team_id)
     if team is None:
@@ -491,14 +658,11 @@ def get_team_members_route(
             detail="Team not found",
         )
 
-    members = list_team_members(db, team_id=team_id)
+    # (TeamMember, User) en un solo JOIN
+    members = list_team_members_with_users(db, team_id=team_id)
 
     results: list[TeamMemberOut] = []
-    for m in members:
-        user = get_user_by_id(db, m.user_id)
-        if not user:
-            continue
-
+    for m, user in members:
         # 🔹 convertimos el ORM User a SimpleUserOut
         user_out = SimpleUserOut.model_validate(user, from_attributes=True)
 
@@ -520,7 +684,7 @@ def get_team_members_route(
 def reject_team_invite_route(
     team_id: int,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     try:
         reject_team_invite(
@@ -538,7 +702,7 @@ def update_team_route(
     team_id: int,
     data: TeamUpdate,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     team = get_team_by_id(db, team_id=team_id)
     if team is None:
@@ -563,7 +727,7 @@ def update_team_route(
 def delete_team_route(
     team_id: int,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     team = get_team_by_id(db, team_id=team_id)
     if team is None:
@@ -580,8 +744,8 @@ def delete_team_route(
 @router.get("/users/search", response_model=UserSearchOut)
 def search_user_by_email(
     email: str,
-    db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_session),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     user = db.query(User).filter(User.email == email).first()
 
@@ -595,7 +759,7 @@ def search_user_by_email(
 def create_friend_request(
     data: FriendRequestCreate,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     try:
         req = send_contact_request(
@@ -616,13 +780,33 @@ def create_friend_request(
     }
 
 
+def _password_pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service busy, try again",
+        headers={"Retry-After": "1"},
+    )
+
+
+# register/login son async: bcrypt corre en password_pool y la BD en el
+# threadpool, así una ráfaga de logins no acapara threads mientras espera.
 @auth_router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def register_user(
+async def register_user(
     data: RegisterRequest,
     db: Session = Depends(get_session),
 ):
+    if await run_in_threadpool(get_user_by_email, db, data.email) is not None:
+        raise HTTPException(status_code=400, detail="Email is already registered")
+
+    try:
+        password_hash = await password_pool.hash_async(data.password)
+    except PasswordPoolBusy:
+        raise _password_pool_busy()
+
     try:
-        user = create_user(db, name=data.name, email=data.email, password=data.password)
+        user = await run_in_threadpool(
+            create_user, db, name=data.name, email=data.email, password_hash=password_hash
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -630,79 +814,159 @@ def register_user(
 
 
 @auth_router.post("/login", response_model=UserOut)
-def login(
+async def login(
     data: LoginRequest,
     request: Request,
     db: Session = Depends(get_session),
 ):
+    user = await run_in_threadpool(get_user_by_email, db, data.email)
+    if user is None:
+        raise HTTPException(status_code=400, detail="Invalid email or password")
+
     try:
-        user = verify_user(db, data.email, data.password)
-    except ValueError:
+        ok = await password_pool.check_async(data.password, user.password_hash)
+    except PasswordPoolBusy:
+        raise _password_pool_busy()
+
+    if not ok:
         raise HTTPException(status_code=400, detail="Invalid email or password")
 
+    # Upgrade del cost si el hash guardado no coincide con el calibrado.
+    # Si el pool está saturado se deja para el próximo login.
+    if password_needs_rehash(user.password_hash):
+        try:
+            new_hash = await password_pool.hash_async(data.password)
+        except PasswordPoolBusy:
+            new_hash = None
+        if new_hash is not None:
+            await run_in_threadpool(update_password_hash, db, user, new_hash)
+
     # guardar user_id en la sesión (cookie firmada)
     request.session["user_id"] = user.id
+    user_identity_cache.put(user.id, UserIdentity.from_user(user))
 
     return user
 
 
 @auth_router.post("/logout")
 def logout(request: Request):
+    user_id = request.session.get("user_id")
+    if user_id:
+        user_identity_cache.invalidate(user_id)
     request.session.clear()
     return {"ok": True}
 
 
 @auth_router.get("/me", response_model=UserOut)
-def read_me(current_user: User = Depends(get_current_user)):
+def read_me(current_user: UserIdentity = Depends(get_current_user)):
     return current_user
+# -----------------------------------------------------------------------
+# PAGINACIÓN KEYSET (/my-events, /my-invitations)
+# -----------------------------------------------------------------------
+# El body sigue siendo una lista; el cursor de la página siguiente va en el
+# header X-Next-Cursor (ausente en la última página).
+
+MY_LIST_DEFAULT_LIMIT = 50
+MY_LIST_MAX_LIMIT = 500
+
+
+class ListPage(NamedTuple):
+    after: PageKey | None
+    start: date | None
+    limit: int
+
+
+def _encode_cursor(key: PageKey) -> str:
+    d, t, row_id = key
+    raw = f"{d.isoformat()}|{t.isoformat()}|{row_id}"
+    return urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> PageKey:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        d, t, row_id = urlsafe_b64decode(padded).decode("utf-8").split("|")
+        return date.fromisoformat(d), dtime.fromisoformat(t), int(row_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def list_page_params(
+    cursor: str | None = None,
+    limit: int = Query(MY_LIST_DEFAULT_LIMIT, ge=1, le=MY_LIST_MAX_LIMIT),
+    from_date: date | None = Query(None, alias="from"),
+    include_past: bool = False,
+) -> ListPage:
+    # Por defecto: próximos primero (desde hoy en adelante)
+    if from_date is None and not include_past:
+        from_date = datetime.utcnow().date()
+    after = _decode_cursor(cursor) if cursor else None
+    return ListPage(after=after, start=from_date, limit=limit)
+
+
+def dashboard_page_params(
+    limit: int = Query(MY_LIST_DEFAULT_LIMIT, ge=1, le=MY_LIST_MAX_LIMIT),
+    from_date: date | None = Query(None, alias="from"),
+    include_past: bool = False,
+) -> ListPage:
+    # Sin cursor: cada sección pagina con su propia clave, así que las páginas
+    # siguientes se piden a /my-events y /my-invitations con su next_cursor.
+    return list_page_params(None, limit, from_date, include_past)
+
+
+def _set_next_cursor(response: Response, next_key: PageKey | None) -> None:
+    if next_key is not None:
+        response.headers["X-Next-Cursor"] = _encode_cursor(next_key)
+
+
 @router.get("/my-events", response_model=List[EventOut])
 def get_my_events(
-    db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    page: ListPage = Depends(list_page_params),
+    db: Session = Depends(get_read_session),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     """
-    Devuelve todos los eventos creados por el usuario actual,
-    incluyendo todos los invitados (excepto el owner) en un solo query.
+    Devuelve una página de los eventos creados por el usuario actual,
+    cada uno con sus invitados (excepto el owner).
     """
+    items, next_key = _my_events_out(db, current_user.id, page)
+    _set_next_cursor(response, next_key)
+    return items
+
+
+def _my_events_out(db: Session, user_id: int, page: ListPage) -> tuple[list[EventOut], PageKey | None]:
+    # 1) Primero se pagina sobre events (índice owner_id, date, time, id)
+    events = list_owned_events_page(db, user_id, page.after, page.limit + 1, page.start)
+    next_key = None
+    if len(events) > page.limit:
+        events = events[:page.limit]
+        last = events[-1]
+        next_key = (last.date, last.time, last.id)
+
+    events_out_by_id: dict[int, EventOut] = {
+        ev.id: EventOut(
+            id=ev.id,
+            title=ev.title,
+            date=ev.date,
+            time=ev.time,
+            endtime=ev.endtime,
+            location=ev.location,
+            description=ev.description,
+            event_url=ev.event_url,
+            invitees=[],
+        )
+        for ev in events
+    }
+    owner_by_event = {ev.id: ev.owner_id for ev in events}
 
-    # Hacemos un LEFT JOIN de eventos -> invitaciones -> usuario invitado
-    rows = (
-        db.query(Event, EventInvitation, User)
-        .outerjoin(EventInvitation, EventInvitation.event_id == Event.id)
-        .outerjoin(User, User.id == EventInvitation.user_id)
-        .filter(Event.owner_id == current_user.id)
-        .order_by(Event.date.asc(), Event.time.asc())
-        .all()
-    )
-
-    # Agrupamos por evento, construyendo EventOut con invitees embebidos
-    events_out_by_id: dict[int, EventOut] = {}
-
-    for ev, inv, invited_user in rows:
-        # Crear el EventOut la primera vez que vemos este evento
-        if ev.id not in events_out_by_id:
-            events_out_by_id[ev.id] = EventOut(
-                id=ev.id,
-                title=ev.title,
-                date=ev.date,
-                time=ev.time,
-                endtime=ev.endtime,
-                location=ev.location,
-                description=ev.description,
-                event_url=ev.event_url,
-                invitees=[],
-            )
-
-        # Si no hay invitación (evento sin invitados), continuamos
-        if inv is None or invited_user is None:
-            continue
-
+    # 2) Luego se adjuntan los invitados solo de los eventos de esta página
+    for inv, invited_user in list_invitees_for_events(db, list(events_out_by_id)):
         # Excluir al owner de la lista de invitados
-        if invited_user.id == ev.owner_id:
+        if invited_user.id == owner_by_event[inv.event_id]:
             continue
 
-        # Añadir invitado a la lista
-        events_out_by_id[ev.id].invitees.append(
+        events_out_by_id[inv.event_id].invitees.append(
             {
                 "name": invited_user.name,
                 "email": invited_user.email,
@@ -711,14 +975,14 @@ def get_my_events(
         )
 
     # dict conserva el orden de inserción, y la query ya viene ordenada por fecha/hora
-    return list(events_out_by_id.values())
+    return list(events_out_by_id.values()), next_key
 
 
 @router.delete("/events/{event_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_event_route(
     event_id: int,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     event = get_event_by_id(db, event_id)
     if event is None:
@@ -744,13 +1008,13 @@ def delete_event_route(
 @router.get("/contacts/search", response_model=list[SimpleUserOut])
 def search_contacts_route(
     q: str,
-    db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_session),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     if not q or len(q.strip()) < 1:
         return []
 
-    users = search_user_contacts_by_query(db, current_user.id, q.strip())
+    users = typeahead_contacts(db, current_user.id, q.strip())
     return [
         SimpleUserOut.model_validate(u, from_attributes=True)
         for u in users
@@ -760,13 +1024,13 @@ def search_contacts_route(
 @router.get("/teams/search", response_model=list[TeamOut])
 def search_teams_route(
     q: str,
-    db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_session),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     if not q or len(q.strip()) < 1:
         return []
 
-    teams = search_user_teams_by_query(db, current_user.id, q.strip())
+    teams = typeahead_teams(db, current_user.id, q.strip())
     return [
         TeamOut.model_validate(t, from_attributes=True)
         for t in teams
@@ -775,26 +1039,23 @@ def search_teams_route(
 
 @router.get("/my-invitations", response_model=List[InvitationOut])
 def get_my_invitations(
-    db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    page: ListPage = Depends(list_page_params),
+    db: Session = Depends(get_read_session),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
-    rows = (
-        db.query(
-            EventInvitation.id.label("invitation_id"),
-            EventInvitation.status.label("inv_status"),
-            Event.title.label("ev_title"),
-            Event.date.label("ev_date"),
-            Event.time.label("ev_time"),
-            Event.endtime.label("ev_endtime"),
-            Event.location.label("ev_location"),
-            User.name.label("host_name"),
-        )
-        .join(Event, Event.id == EventInvitation.event_id)
-        .join(User, User.id == Event.owner_id)
-        .filter(EventInvitation.user_id == current_user.id)
-        .order_by(Event.date.asc(), Event.time.asc())
-        .all()
-    )
+    items, next_key = _my_invitations_out(db, current_user.id, page)
+    _set_next_cursor(response, next_key)
+    return items
+
+
+def _my_invitations_out(db: Session, user_id: int, page: ListPage) -> tuple[list[InvitationOut], PageKey | None]:
+    rows = list_invitations_page(db, user_id, page.after, page.limit + 1, page.start)
+    next_key = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        next_key = (last.ev_date, last.ev_time, last.invitation_id)
 
     result: list[InvitationOut] = []
 
@@ -812,15 +1073,14 @@ def get_my_invitations(
             )
         )
 
-    return result
-
+    return result, next_key
 
 
 @router.post("/events", response_model=EventOut, status_code=status.HTTP_201_CREATED)
 def create_event_route(
     data: EventCreate,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     # 1) Crear el evento base en la BD
     try:
@@ -837,54 +1097,23 @@ def create_event_route(
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    invited_summary: list[dict] = []
-
-    # 2) Invitar contactos individuales
-    for uid in data.contact_ids or []:
-        try:
-            inv = invite_user_to_event(db=db, event_id=ev.id, user_id=uid)
-        except ValueError:
-            # p.ej. "User already invited to this event" -> ignoramos
-            continue
-
-
-        user = get_user_by_id(db, inv.user_id)
-        if not user:
-            continue
-
-        invited_summary.append(
-            {
-                "name": user.name,
-                "email": user.email,
-                "rsvp": inv.status,  # será "pending" al crearse
-            }
-        )
-
-    # 3) Invitar equipos y auto-invitar miembros aceptados
-    for tid in data.team_ids or []:
-        try:
-            invite_team_to_event(db, event_id=ev.id, team_id=tid)
-            created_invites = auto_invite_team_members(db, event_id=ev.id, team_id=tid)
-        except ValueError:
-            continue
+    # 2) Invitar contactos y equipos (miembros aceptados) en un solo INSERT
+    created_invites = bulk_invite_to_event(
+        db,
+        event_id=ev.id,
+        user_ids=data.contact_ids or [],
+        team_ids=data.team_ids or [],
+    )
 
-        # created_invites son EventInvitation ya recién creadas, status = "pending"
-        for inv in created_invites:
-            # opcional: no añadir al owner como invitado
-            if inv.user_id == ev.owner_id:
-                continue
-
-            user = get_user_by_id(db, inv.user_id)
-            if not user:
-                continue
-
-            invited_summary.append(
-                {
-                    "name": user.name,
-                    "email": user.email,
-                    "rsvp": inv.status,  # "pending"
-                }
-            )
+    # 3) Nombre/email de todos los invitados en un solo JOIN
+    invited_summary = [
+        {
+            "name": row.name,
+            "email": row.email,
+            "rsvp": row.status,  # será "pending" al crearse
+        }
+        for row in list_invitees_by_invitation_ids(db, [inv.id for inv in created_invites])
+    ]
 
     # 4) Devolver el evento con los invitees embebidos
     return EventOut(
@@ -905,7 +1134,7 @@ def invite_user_to_event_route(
     event_id: int,
     data: EventInviteUserRequest,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     # 1) Verificar que el evento exista
     event = get_event_by_id(db, event_id)
@@ -952,20 +1181,18 @@ def invite_user_to_event_route(
     response_model=list[IncomingFriendRequestOut],
 )
 def list_received_friend_requests(
-    db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_session),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
-    # Usa tu helper existente:
-    pending = list_pending_received_requests(db, current_user.id)
-    results = []
+    return _received_friend_requests_out(db, current_user.id)
 
-    for c in pending:
-        # c.user_id = quien envió la solicitud
-        from_user = db.query(User).filter(User.id == c.user_id).first()
-        if not from_user:
-            # si por alguna razón el user no existe, lo saltamos
-            continue
 
+def _received_friend_requests_out(db: Session, user_id: int) -> list[IncomingFriendRequestOut]:
+    # (Contact, User que envió la solicitud) en un solo JOIN
+    pending = list_pending_received_requests_with_senders(db, user_id)
+    results = []
+
+    for c, from_user in pending:
         results.append(
             IncomingFriendRequestOut(
                 id=c.id,
@@ -980,7 +1207,7 @@ def list_received_friend_requests(
 def accept_friend_request_route(
     request_id: int,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     contact = (
         db.query(Contact)
@@ -1011,7 +1238,7 @@ def accept_friend_request_route(
 def reject_friend_request_route(
     request_id: int,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
     contact = (
         db.query(Contact)
@@ -1038,18 +1265,18 @@ def reject_friend_request_route(
 
 @router.get("/contacts", response_model=list[ContactOut])
 def list_my_contacts(
-    db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_session),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
-    rows = list_contacts(db, current_user.id)  # devuelve Contact con user_id = current_user
-    results = []
+    return _contacts_out(db, current_user.id)
 
-    for c in rows:
-        # el contacto es el usuario en contact_id
-        friend = db.query(User).filter(User.id == c.contact_id).first()
-        if not friend:
-            continue
 
+def _contacts_out(db: Session, user_id: int) -> list[ContactOut]:
+    # (Contact, User en contact_id) en un solo JOIN
+    rows = list_contacts_with_users(db, user_id)
+    results = []
+
+    for c, friend in rows:
         results.append(
             ContactOut(
                 id=c.id,
@@ -1065,7 +1292,7 @@ def list_my_contacts(
 def delete_contact_route(
     contact_user_id: int,
     db: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_user),
 ):
 
     entry = (
@@ -1088,13 +1315,444 @@ def delete_contact_route(
     return
 
 
+# -----------------------------------------------------------------------
+# BADGES Y DASHBOARD
+# -----------------------------------------------------------------------
+
+def _badge_cache_headers(response: Response) -> None:
+    # El navegador puede reusar la respuesta mientras dure el TTL del server
+    response.headers["Cache-Control"] = f"private, max-age={int(BADGE_COUNTS_CACHE_TTL)}"
+
+
+@router.get("/counts", response_model=BadgeCounts)
+def get_counts(
+    response: Response,
+    db: Session = Depends(get_read_session),
+    current_user: UserIdentity = Depends(get_current_user),
+):
+    """Contadores de pendientes para los badges (una query, cacheada por usuario)."""
+    _badge_cache_headers(response)
+    return get_badge_counts(db, current_user.id)
+
+
+# Todo lo que pinta la pantalla de inicio en un request: una cookie, un
+# get_current_user y una sesión de lectura en vez de cuatro fetches.
+
+DASHBOARD_SECTIONS = ("events", "invitations", "friend_requests", "team_invitations", "counts")
+
+
+def dashboard_fields(fields: str | None = None) -> list[str]:
+    if not fields:
+        return list(DASHBOARD_SECTIONS)
+
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = wanted - set(DASHBOARD_SECTIONS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown dashboard fields: {', '.join(sorted(unknown))}",
+        )
+    return [section for section in DASHBOARD_SECTIONS if section in wanted]
+
+
+def _dashboard_section(db: Session, section: str, user_id: int, page: ListPage) -> dict:
+    if section == "events":
+        items, next_key = _my_events_out(db, user_id, page)
+        return {"events": items, "events_next_cursor": next_key and _encode_cursor(next_key)}
+    if section == "invitations":
+        items, next_key = _my_invitations_out(db, user_id, page)
+        return {"invitations": items, "invitations_next_cursor": next_key and _encode_cursor(next_key)}
+    if section == "friend_requests":
+        return {"friend_requests": _received_friend_requests_out(db, user_id)}
+    if section == "team_invitations":
+        return {"team_invitations": _team_invitations_out(db, user_id)}
+    if section == "counts":
+        return {"counts": BadgeCounts(**get_badge_counts(db, user_id))}
+    raise ValueError(f"Unknown dashboard section: {section}")
+
+
+@router.get("/dashboard", response_model=DashboardOut, response_model_exclude_unset=True)
+def get_dashboard(
+    fields: list[str] = Depends(dashboard_fields),
+    page: ListPage = Depends(dashboard_page_params),
+    db: Session = Depends(get_read_session),
+    current_user: UserIdentity = Depends(get_current_user),
+):
+    """
+    /my-events, /my-invitations, /friend-requests/received,
+    /teams/invitations y los contadores de badges en una sola respuesta.
+    `?fields=events,counts` limita las secciones; `limit`/`from`/`include_past`
+    aplican a events e invitations como en sus endpoints. Trae solo la primera
+    página de cada una: el resto se pide a /my-events y /my-invitations con
+    events_next_cursor / invitations_next_cursor.
+    """
+    out: dict = {}
+    for section in fields:
+        out.update(_dashboard_section(db, section, current_user.id, page))
+    return DashboardOut(**out)
+
+
+# -----------------------------------------------------------------------
+# STREAM (SSE)
+# -----------------------------------------------------------------------
+# Empuja al cliente las invitaciones, RSVPs y solicitudes que lo afectan
+# (ver NOTIFICATIONS en base.py) para que no tenga que re-pollear listas.
+
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_RETRY_MS = 5000
+
+
+def _sse_message(message: dict) -> str:
+    return f"event: {message['type']}\ndata: {json.dumps(message, separators=(',', ':'))}\n\n"
+
+
+@router.get("/stream")
+async def event_stream(
+    request: Request,
+    current_user: UserIdentity = Depends(get_current_user),
+):
+    try:
+        sub = notification_broker.subscribe(current_user.id)
+    except StreamLimitReached:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many open streams",
+        )
+
+    async def body():
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(sub.queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # comentario SSE: mantiene viva la conexión en proxies
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse_message(message)
+        finally:
+            notification_broker.unsubscribe(sub)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# -----------------------------------------------------------------------
+# ASYNC MODE (DB_ASYNC=1)
+# -----------------------------------------------------------------------
+# Las rutas más calientes en versión `async def` sobre AsyncSession. Se
+# registran antes que las sync con el mismo path, así que las reemplazan
+# solo cuando el modo async está activo; el resto sigue en el threadpool.
+
+async_router = APIRouter(prefix="/api", tags=["events"], include_in_schema=False)
+async_auth_router = APIRouter(prefix="/api/auth", tags=["auth"], include_in_schema=False)
+
+
+async def get_current_user_async(request: Request) -> UserIdentity:
+    user_id = request.session.get("user_id")
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+        )
+
+    user = user_identity_cache.get(user_id)
+    if user is None:
+        async with get_async_read_session_cm() as db:
+            user = await get_user_identity_async(db, user_id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+        )
+
+    return user
+
+
+@async_auth_router.get("/me", response_model=UserOut)
+async def read_me_async(current_user: UserIdentity = Depends(get_current_user_async)):
+    return current_user
+
+
+@async_router.get("/calendar/{token}.ics")
+async def calendar_feed_async(
+    token: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_read_session),
+):
+    user = await get_user_by_calendar_token_async(db, token)
+    if user is None:
+        raise HTTPException(status_code=404, detail="Calendar not found")
+
+    start, end = calendar_feed_window()
+    etag, last_modified = await get_calendar_feed_version_async(db, user, start, end)
+    headers = _calendar_headers(etag, last_modified)
+
+    if _calendar_not_modified(request, etag, last_modified):
+        metrics.ics_not_modified_total.inc()
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    cached = ics_feed_cache.get(user.id, etag)
+    if cached is not None:
+        metrics.ics_feeds_served_total.inc(source="cache")
+        return Response(content=cached, media_type="text/calendar", headers=headers)
+
+    user_id, timezone_name = user.id, user.timezone
+
+    async def body():
+        async with get_async_stream_session_cm() as stream_db:
+            events = aiter_events_for_calendar(stream_db, user_id, start, end)
+            chunks = aiter_ics_for_events(events, timezone_name=timezone_name)
+            async for chunk in ics_feed_cache.astream_through(user_id, etag, chunks):
+                yield chunk
+
+    metrics.ics_feeds_served_total.inc(source="stream")
+    return StreamingResponse(body(), media_type="text/calendar", headers=headers)
+
+
+@async_router.get("/my-events", response_model=List[EventOut])
+async def get_my_events_async(
+    response: Response,
+    page: ListPage = Depends(list_page_params),
+    db: AsyncSession = Depends(get_async_read_session),
+    current_user: UserIdentity = Depends(get_current_user_async),
+):
+    items, next_key = await db.run_sync(_my_events_out, current_user.id, page)
+    _set_next_cursor(response, next_key)
+    return items
+
+
+@async_router.get("/my-invitations", response_model=List[InvitationOut])
+async def get_my_invitations_async(
+    response: Response,
+    page: ListPage = Depends(list_page_params),
+    db: AsyncSession = Depends(get_async_read_session),
+    current_user: UserIdentity = Depends(get_current_user_async),
+):
+    items, next_key = await db.run_sync(_my_invitations_out, current_user.id, page)
+    _set_next_cursor(response, next_key)
+    return items
+
+
+@async_router.get("/friend-requests/received", response_model=list[IncomingFriendRequestOut])
+async def list_received_friend_requests_async(
+    db: AsyncSession = Depends(get_async_read_session),
+    current_user: UserIdentity = Depends(get_current_user_async),
+):
+    return await db.run_sync(_received_friend_requests_out, current_user.id)
+
+
+@async_router.get("/teams/invitations", response_model=list[TeamInvitationOut])
+async def list_team_invitations_async(
+    db: AsyncSession = Depends(get_async_read_session),
+    current_user: UserIdentity = Depends(get_current_user_async),
+):
+    return await db.run_sync(_team_invitations_out, current_user.id)
+
+
+@async_router.get("/contacts", response_model=list[ContactOut])
+async def list_my_contacts_async(
+    db: AsyncSession = Depends(get_async_read_session),
+    current_user: UserIdentity = Depends(get_current_user_async),
+):
+    return await db.run_sync(_contacts_out, current_user.id)
+
+
+@async_router.get("/counts", response_model=BadgeCounts)
+async def get_counts_async(
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_session),
+    current_user: UserIdentity = Depends(get_current_user_async),
+):
+    _badge_cache_headers(response)
+    return await get_badge_counts_async(db, current_user.id)
+
+
+@async_router.get("/dashboard", response_model=DashboardOut, response_model_exclude_unset=True)
+async def get_dashboard_async(
+    fields: list[str] = Depends(dashboard_fields),
+    page: ListPage = Depends(dashboard_page_params),
+    current_user: UserIdentity = Depends(get_current_user_async),
+):
+    # Una conexión no puede correr dos queries a la vez: cada sección va en
+    # su propia sesión de lectura (autocommit) y se esperan todas juntas.
+    async def load(section: str) -> dict:
+        async with get_async_read_session_cm() as db:
+            return await db.run_sync(_dashboard_section, section, current_user.id, page)
+
+    out: dict = {}
+    for part in await asyncio.gather(*(load(section) for section in fields)):
+        out.update(part)
+    return DashboardOut(**out)
+
+
+# -----------------------------------------------------------------------
+# INSTRUMENTACIÓN SQL POR REQUEST
+# -----------------------------------------------------------------------
+
+# ms; con un request más lento que esto se loguean todos sus statements.
+# Vacío = desactivado (y no se guardan los statements).
+SLOW_REQUEST_MS = float(os.environ["SLOW_REQUEST_MS"]) if os.environ.get("SLOW_REQUEST_MS") else None
+
+sql_logger = logging.getLogger("eventease.sql")
+
+
+def _route_path(scope) -> str:
+    # FastAPI deja la ruta matcheada en el scope: /api/teams/{team_id}, no /api/teams/7
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path", "")
+
+
+def _server_timing(stats: QueryStats) -> str:
+    return (
+        f'db;dur={stats.total_time * 1000:.1f};desc="{stats.count} queries", '
+        f"db-slowest;dur={stats.slowest_time * 1000:.1f}, "
+        f"db-pool;dur={stats.pool_wait * 1000:.1f}"
+    )
+
+
+class QueryStatsMiddleware:
+    """
+    Cuenta y cronometra el SQL de cada request (ver QUERY STATS en base.py),
+    lo manda en el header Server-Timing y deja una línea JSON en el logger
+    eventease.sql. Server-Timing refleja lo ejecutado hasta que arranca la
+    respuesta; el log incluye también lo que corre mientras se hace streaming.
+    """
+
+    def __init__(self, app, slow_request_ms: float | None = SLOW_REQUEST_MS):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = perf_counter()
+        status_code = 500
+
+        with collect_query_stats(capture=self.slow_request_ms is not None) as stats:
+            async def send_with_timing(message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    MutableHeaders(scope=message).append("Server-Timing", _server_timing(stats))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                self._log(scope, status_code, perf_counter() - started, stats)
+
+    def _log(self, scope, status_code: int, elapsed: float, stats: QueryStats) -> None:
+        duration_ms = elapsed * 1000
+        slow = self.slow_request_ms is not None and duration_ms >= self.slow_request_ms
+        if not slow and not sql_logger.isEnabledFor(logging.INFO):
+            return
+
+        record = {
+            "method": scope["method"],
+            "route": _route_path(scope),
+            "status": status_code,
+            "duration_ms": round(duration_ms, 2),
+            "db_queries": stats.count,
+            "db_time_ms": round(stats.total_time * 1000, 2),
+            "db_slowest_ms": round(stats.slowest_time * 1000, 2),
+            "db_pool_wait_ms": round(stats.pool_wait * 1000, 2),
+        }
+        if slow:
+            record["slowest_statement"] = stats.slowest_statement
+            record["statements"] = [
+                {"ms": round(elapsed_s * 1000, 2), "sql": statement}
+                for elapsed_s, statement in stats.statements
+            ]
+            sql_logger.warning(json.dumps(record))
+        else:
+            sql_logger.info(json.dumps(record))
+
+
+# -----------------------------------------------------------------------
+# MÉTRICAS (PROMETHEUS)
+# -----------------------------------------------------------------------
+
+def _route_label(scope) -> str:
+    # Sin ruta matcheada (404) no se usa el path crudo: cardinalidad sin límite
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class HTTPMetricsMiddleware:
+    """
+    Latencia, status y requests en curso por ruta. La duración cubre hasta
+    el último chunk enviado, así que incluye el streaming de la respuesta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        started = perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics.http_requests_in_flight.inc(method=method)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.http_requests_in_flight.dec(method=method)
+            route = _route_label(scope)
+            metrics.http_request_duration_seconds.observe(perf_counter() - started, method=method, route=route)
+            metrics.http_requests_total.inc(method=method, route=route, status=status_code)
+
+
+@metrics.registry.collector("eventease_db_pool", "gauge", "Estado del pool de conexiones de la BD.")
+def _db_pool_metrics():
+    for engine_name, stats in db_pool_stats().items():
+        for key, value in stats.items():
+            if isinstance(value, (int, float)):
+                yield {"engine": engine_name, "stat": key}, value
+
+
+@metrics.registry.collector("eventease_password_pool", "gauge", "Estado del pool de workers de bcrypt.")
+def _password_pool_metrics():
+    for key, value in password_pool.stats().items():
+        if isinstance(value, (int, float)):
+            yield {"stat": key}, value
+
+
+@metrics.registry.collector("eventease_stream_connections", "gauge", "Conexiones SSE abiertas en este proceso.")
+def _stream_metrics():
+    yield {}, notification_broker.connection_count()
 
 
 origins = [
     "http://localhost:5173",           # desarrollo local
     "http://74.208.166.37:22090",      # producción en la VPS
 ]
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    rounds = await run_in_threadpool(calibrate_bcrypt_rounds)
+    logger.info("bcrypt cost: %s rounds", rounds)
+    yield
+    await dispose_async_engine()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(SessionMiddleware, secret_key="CAMBIA_ESTA_CLAVE_SUPER_SECRETA")
 
@@ -1104,7 +1762,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Último en agregarse = más externo: mide también a los otros middlewares
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(HTTPMetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    return Response(
+        content=metrics.registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+if DB_ASYNC:
+    app.include_router(async_auth_router)
+    app.include_router(async_router)
+
 app.include_router(auth_router)
 app.include_router(router)
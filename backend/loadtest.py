@@ -0,0 +1,369 @@
+"""
+Generador de carga con una mezcla de tráfico parecida a la real.
+
+Levanta `app` de api.py con uvicorn en un hilo (o usa --url si el servidor ya
+está corriendo) y la golpea con --concurrency usuarios virtuales durante
+--duration segundos. Los usuarios salen de la BD cargada con
+synthetic_data.py, así que se necesita el mismo DATABASE_URL. Al final
+imprime un JSON con throughput, latencias p50/p95/p99 y tasa de errores por
+ruta, más la configuración usada, para comparar releases o modos:
+
+    python synthetic_data.py --users 100000
+    python loadtest.py --duration 60 --concurrency 50 > sync.json
+    DB_ASYNC=1 python loadtest.py --duration 60 --concurrency 50 > async.json
+    USER_IDENTITY_CACHE_TTL=0 BADGE_COUNTS_CACHE_TTL=0 python loadtest.py > sin-cache.json
+
+Acciones de la mezcla (--mix accion=peso,...):
+    login          POST /api/auth/login
+    dashboard      GET  /api/dashboard
+    ics            GET  /api/calendar/{token}.ics (con If-None-Match, como un cliente de calendario)
+    create_event   POST /api/events invitando a un equipo propio y algunos contactos
+    rsvp           POST /api/invitations/{id}/accept|reject sobre una invitación pendiente
+    search         GET  /api/contacts/search, un request por tecla
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import threading
+from datetime import date, timedelta
+from time import perf_counter, sleep
+
+import httpx
+from sqlalchemy import select
+
+from base import Contact, EventInvitation, Team, User, get_read_session_cm
+from synthetic_data import DEFAULT_PASSWORD, SYNTHETIC_EMAIL
+
+DEFAULT_MIX = "login=2,dashboard=30,ics=25,create_event=5,rsvp=13,search=25"
+ACTIONS = ("login", "dashboard", "ics", "create_event", "rsvp", "search")
+
+# Variables de entorno que cambian el comportamiento del servidor; se copian
+# al reporte para saber contra qué configuración se midió.
+REPORTED_ENV_PREFIXES = ("DB_", "BCRYPT_", "PASSWORD_POOL_", "SLOW_REQUEST_MS")
+REPORTED_ENV_SUFFIXES = ("_CACHE_TTL", "_CACHE_SIZE", "_CACHE_USERS")
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix: dict[str, float] = {}
+    for part in spec.split(","):
+        action, _, weight = part.partition("=")
+        action = action.strip()
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown action: {action!r}")
+        mix[action] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise ValueError("Mix must have a positive total weight")
+    return mix
+
+
+# -----------------------------------------------------------------------
+# USUARIOS VIRTUALES
+# -----------------------------------------------------------------------
+
+class VirtualUser:
+    __slots__ = ("user_id", "email", "calendar_token", "team_ids", "contact_ids", "pending", "etag")
+
+    def __init__(self, user_id: int, email: str, calendar_token: str | None):
+        self.user_id = user_id
+        self.email = email
+        self.calendar_token = calendar_token
+        self.team_ids: list[int] = []
+        self.contact_ids: list[int] = []
+        self.pending: list[int] = []      # ids de invitaciones pendientes
+        self.etag: str | None = None
+
+
+def load_virtual_users(count: int, seed: int) -> list[VirtualUser]:
+    """Elige `count` usuarios sintéticos (deterministas por semilla) y lo que necesitan las acciones."""
+    like = SYNTHETIC_EMAIL.format(0).replace("0000000", "%")
+    with get_read_session_cm() as db:
+        ids = db.scalars(select(User.id).where(User.email.like(like)).order_by(User.id)).all()
+        if not ids:
+            raise SystemExit("No hay usuarios sintéticos: correr antes synthetic_data.py")
+        chosen = random.Random(seed).sample(ids, min(count, len(ids)))
+
+        users = {
+            row.id: VirtualUser(row.id, row.email, row.calendar_token)
+            for row in db.execute(
+                select(User.id, User.email, User.calendar_token).where(User.id.in_(chosen))
+            )
+        }
+        for team_id, owner_id in db.execute(select(Team.id, Team.owner_id).where(Team.owner_id.in_(chosen))):
+            users[owner_id].team_ids.append(team_id)
+        for user_id, contact_id in db.execute(
+            select(Contact.user_id, Contact.contact_id)
+            .where(Contact.user_id.in_(chosen), Contact.status == "accepted")
+        ):
+            users[user_id].contact_ids.append(contact_id)
+        for invitation_id, user_id in db.execute(
+            select(EventInvitation.id, EventInvitation.user_id)
+            .where(EventInvitation.user_id.in_(chosen), EventInvitation.status == "pending")
+            .order_by(EventInvitation.id)
+        ):
+            users[user_id].pending.append(invitation_id)
+
+    return [users[user_id] for user_id in chosen]
+
+
+# -----------------------------------------------------------------------
+# RESULTADOS
+# -----------------------------------------------------------------------
+
+class RouteStats:
+    __slots__ = ("latencies", "errors", "statuses")
+
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.errors = 0
+        self.statuses: dict[int, int] = {}
+
+
+class Recorder:
+    def __init__(self):
+        self.routes: dict[str, RouteStats] = {}
+        self.skipped: dict[str, int] = {}
+
+    def record(self, route: str, elapsed: float, status_code: int | None) -> None:
+        stats = self.routes.setdefault(route, RouteStats())
+        stats.latencies.append(elapsed)
+        key = status_code or 0     # 0 = error de conexión / timeout
+        stats.statuses[key] = stats.statuses.get(key, 0) + 1
+        if status_code is None or status_code >= 400:
+            stats.errors += 1
+
+    def skip(self, action: str) -> None:
+        self.skipped[action] = self.skipped.get(action, 0) + 1
+
+    def report(self, elapsed: float) -> dict:
+        routes = {name: _summary(stats, elapsed) for name, stats in sorted(self.routes.items())}
+        total = RouteStats()
+        for stats in self.routes.values():
+            total.latencies += stats.latencies
+            total.errors += stats.errors
+        return {
+            "duration_s": round(elapsed, 2),
+            "total": _summary(total, elapsed),
+            "routes": routes,
+            "skipped": self.skipped,
+        }
+
+
+def _percentile(ordered: list[float], p: float) -> float:
+    # nearest-rank
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summary(stats: RouteStats, elapsed: float) -> dict:
+    ordered = sorted(stats.latencies)
+    count = len(ordered)
+    out = {
+        "requests": count,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(stats.errors / count, 4) if count else 0.0,
+        "latency_ms": {
+            "mean": round(sum(ordered) / count * 1000, 2) if count else 0.0,
+            "p50": round(_percentile(ordered, 50) * 1000, 2),
+            "p95": round(_percentile(ordered, 95) * 1000, 2),
+            "p99": round(_percentile(ordered, 99) * 1000, 2),
+            "max": round(ordered[-1] * 1000, 2) if count else 0.0,
+        },
+    }
+    if stats.statuses:
+        out["statuses"] = {str(code): n for code, n in sorted(stats.statuses.items())}
+    return out
+
+
+# -----------------------------------------------------------------------
+# ACCIONES
+# -----------------------------------------------------------------------
+
+class Worker:
+    def __init__(self, client: httpx.AsyncClient, user: VirtualUser, recorder: Recorder,
+                 rng: random.Random, password: str):
+        self.client = client
+        self.user = user
+        self.recorder = recorder
+        self.rng = rng
+        self.password = password
+
+    async def request(self, route: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        started = perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(route, perf_counter() - started, None)
+            return None
+        self.recorder.record(route, perf_counter() - started, response.status_code)
+        return response
+
+    async def login(self) -> None:
+        await self.request("POST /api/auth/login", "POST", "/api/auth/login",
+                           json={"email": self.user.email, "password": self.password})
+
+    async def dashboard(self) -> None:
+        await self.request("GET /api/dashboard", "GET", "/api/dashboard")
+
+    async def ics(self) -> None:
+        if not self.user.calendar_token:
+            self.recorder.skip("ics")
+            return
+        headers = {"If-None-Match": self.user.etag} if self.user.etag else {}
+        response = await self.request("GET /api/calendar/{token}.ics", "GET",
+                                      f"/api/calendar/{self.user.calendar_token}.ics", headers=headers)
+        if response is not None and response.status_code in (200, 304):
+            self.user.etag = response.headers.get("etag", self.user.etag)
+
+    async def create_event(self) -> None:
+        day = date.today() + timedelta(days=self.rng.randint(1, 60))
+        hour = self.rng.randint(8, 20)
+        contacts = self.user.contact_ids
+        await self.request("POST /api/events", "POST", "/api/events", json={
+            "title": "Load test",
+            "date": day.isoformat(),
+            "time": f"{hour:02d}:00",
+            "endtime": f"{hour + 1:02d}:00",
+            "contact_ids": self.rng.sample(contacts, min(3, len(contacts))),
+            "team_ids": self.user.team_ids[:1],
+        })
+
+    async def rsvp(self) -> None:
+        if not self.user.pending:
+            self.recorder.skip("rsvp")
+            return
+        invitation_id = self.user.pending.pop()
+        answer = self.rng.choice(("accept", "reject"))
+        await self.request(f"POST /api/invitations/{{invitation_id}}/{answer}", "POST",
+                           f"/api/invitations/{invitation_id}/{answer}")
+
+    async def search(self) -> None:
+        # Typeahead: una búsqueda por cada tecla de un nombre
+        word = self.rng.choice(("ana", "carla", "diego", "gonz", "mart", "rodri", "silva", "torres"))
+        for i in range(1, len(word) + 1):
+            await self.request("GET /api/contacts/search", "GET", "/api/contacts/search",
+                               params={"q": word[:i]})
+
+
+async def run_load(base_url: str, users: list[VirtualUser], mix: dict[str, float], concurrency: int,
+                   duration: float, seed: int, password: str, timeout: float) -> dict:
+    recorder = Recorder()
+    actions = list(mix)
+    weights = list(mix.values())
+    deadline = perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def virtual_user(index: int) -> None:
+        rng = random.Random(seed * 1_000_003 + index)
+        user = users[index % len(users)]
+        # cada usuario virtual tiene su cliente: cookies de sesión propias
+        async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+            worker = Worker(client, user, recorder, rng, password)
+            await worker.login()
+            while perf_counter() < deadline:
+                action = rng.choices(actions, weights)[0]
+                await getattr(worker, action)()
+
+    started = perf_counter()
+    await asyncio.gather(*(virtual_user(i) for i in range(concurrency)))
+    return recorder.report(perf_counter() - started)
+
+
+# -----------------------------------------------------------------------
+# SERVIDOR
+# -----------------------------------------------------------------------
+
+def start_server(host: str, port: int):
+    """uvicorn en un hilo; devuelve el Server para poder pararlo."""
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn no está instalado; levantar el servidor aparte y usar --url")
+    from api import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise SystemExit("uvicorn no pudo arrancar")
+        sleep(0.05)
+    return server, thread
+
+
+def _reported_env() -> dict[str, str]:
+    return {
+        key: value for key, value in sorted(os.environ.items())
+        if key.startswith(REPORTED_ENV_PREFIXES) or key.endswith(REPORTED_ENV_SUFFIXES)
+        if "PASS" not in key
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="servidor ya levantado; si no, se arranca uvicorn en proceso")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="segundos")
+    parser.add_argument("--users", type=int, default=1_000, help="usuarios sintéticos distintos a usar")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--label", help="nombre libre que se copia al reporte")
+    parser.add_argument("--output", help="archivo para el JSON (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    users = load_virtual_users(args.users, args.seed)
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server, thread = start_server(args.host, args.port)
+        base_url = f"http://{args.host}:{args.port}"
+
+    try:
+        result = asyncio.run(run_load(
+            base_url, users, mix, args.concurrency, args.duration, args.seed, args.password, args.timeout,
+        ))
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join(timeout=10)
+
+    report = {
+        "label": args.label,
+        "config": {
+            "url": base_url,
+            "in_process_server": server is not None,
+            "mix": mix,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "virtual_users": len(users),
+            "seed": args.seed,
+            "env": _reported_env(),
+        },
+        **result,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
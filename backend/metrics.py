@@ -0,0 +1,243 @@
+"""
+Métricas en formato de exposición de Prometheus (text/plain 0.0.4).
+
+Cada hilo escribe en su propio dict (threading.local), sin locks en el
+camino caliente; solo el scrape de /metrics recorre y suma los dicts de
+todos los hilos. Cuando un hilo termina (p. ej. un worker del threadpool que
+anyio retira), su dict se suma a un total de "retirados" y se descarta, así
+que la cantidad de shards no crece con la vida del proceso. Los valores que
+se leen al momento (pool de la BD, conexiones SSE, ...) se registran como
+collectors.
+"""
+from bisect import bisect_left
+import math
+import threading
+import weakref
+from typing import Callable, Iterable
+
+# Buckets en segundos para latencias HTTP
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._local = threading.local()
+        # id del holder -> dict del hilo; _retired acumula los de hilos muertos
+        self._shards: dict[int, dict] = {}
+        self._retired: dict = {}
+        self._shards_lock = threading.Lock()
+        # name -> (type, help, buckets)
+        self._meta: dict[str, tuple[str, str, tuple[float, ...] | None]] = {}
+        self._collectors: list[Callable[[], Iterable[tuple[str, dict, float]]]] = []
+
+    # -- definición ---------------------------------------------------------
+
+    def counter(self, name: str, help: str) -> "Counter":
+        self._meta[name] = ("counter", help, None)
+        return Counter(self, name)
+
+    def gauge(self, name: str, help: str) -> "Gauge":
+        self._meta[name] = ("gauge", help, None)
+        return Gauge(self, name)
+
+    def histogram(self, name: str, help: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> "Histogram":
+        self._meta[name] = ("histogram", help, tuple(sorted(buckets)))
+        return Histogram(self, name, self._meta[name][2])
+
+    def collector(self, name: str, type: str, help: str):
+        """
+        Decorador para métricas que se leen al scrapear; la función devuelve
+        pares (labels, valor).
+        """
+        def register(fn):
+            self._meta[name] = (type, help, None)
+            self._collectors.append(lambda: ((name, labels, value) for labels, value in fn()))
+            return fn
+        return register
+
+    # -- escritura (por hilo, sin locks) ------------------------------------
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = {}
+            # threading.local suelta el holder cuando el hilo termina
+            holder = _ShardHolder()
+            self._local.holder = holder
+            self._local.values = shard
+            with self._shards_lock:
+                self._shards[id(holder)] = shard
+            weakref.finalize(holder, self._retire, id(holder))
+        return shard
+
+    def _retire(self, key: int) -> None:
+        with self._shards_lock:
+            shard = self._shards.pop(key, None)
+            if shard:
+                _merge(self._retired, shard)
+
+    def _add(self, key, amount: float) -> None:
+        shard = self._shard()
+        shard[key] = shard.get(key, 0) + amount
+
+    # -- lectura -------------------------------------------------------------
+
+    def _totals(self) -> dict:
+        # Todo bajo el lock: si no, un shard que se retira a mitad del scrape
+        # se contaría dos veces. Solo compite con altas y bajas de hilos.
+        with self._shards_lock:
+            totals = dict(self._retired)
+            for shard in self._shards.values():
+                # dict.copy() es atómico con el GIL aunque el dueño siga escribiendo
+                _merge(totals, shard.copy())
+        return totals
+
+    def shard_count(self) -> int:
+        with self._shards_lock:
+            return len(self._shards)
+
+    def render(self) -> str:
+        totals = self._totals()
+        by_name: dict[str, list] = {}
+        for (name, labels, suffix), value in totals.items():
+            by_name.setdefault(name, []).append((labels, suffix, value))
+        for collect in self._collectors:
+            for name, labels, value in collect():
+                by_name.setdefault(name, []).append((_labels(labels), "", value))
+
+        lines: list[str] = []
+        for name, (type, help, buckets) in self._meta.items():
+            samples = by_name.get(name)
+            if not samples:
+                continue
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type}")
+            if type == "histogram":
+                lines.extend(_render_histogram(name, buckets, samples))
+            else:
+                for labels, _, value in sorted(samples, key=lambda s: s[0]):
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter:
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: MetricsRegistry, name: str):
+        self._registry = registry
+        self._name = name
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        self._registry._add((self._name, _labels(labels), ""), amount)
+
+
+class Gauge(Counter):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    __slots__ = ("_registry", "_name", "_buckets")
+
+    def __init__(self, registry: MetricsRegistry, name: str, buckets: tuple[float, ...]):
+        self._registry = registry
+        self._name = name
+        self._buckets = buckets
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(labels)
+        # Se guarda el conteo de cada bucket por separado; se acumula al renderizar
+        index = bisect_left(self._buckets, value)
+        shard = self._registry._shard()
+        for k, amount in (
+            ((self._name, key, index), 1),
+            ((self._name, key, "sum"), value),
+            ((self._name, key, "count"), 1),
+        ):
+            shard[k] = shard.get(k, 0) + amount
+
+
+class _ShardHolder:
+    __slots__ = ("__weakref__",)
+
+
+def _merge(into: dict, values: dict) -> None:
+    for key, value in values.items():
+        into[key] = into.get(key, 0) + value
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if value.is_integer():
+            return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _render_histogram(name: str, buckets: tuple[float, ...], samples) -> list[str]:
+    series: dict[Labels, dict] = {}
+    for labels, suffix, value in samples:
+        series.setdefault(labels, {})[suffix] = value
+
+    lines = []
+    for labels in sorted(series):
+        values = series[labels]
+        cumulative = 0
+        for index, bound in enumerate(buckets):
+            cumulative += values.get(index, 0)
+            le = labels + (("le", _format_value(float(bound))),)
+            lines.append(f"{name}_bucket{_format_labels(le)} {_format_value(cumulative)}")
+        cumulative += values.get(len(buckets), 0)
+        lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {_format_value(cumulative)}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(values.get('sum', 0))}")
+        lines.append(f"{name}_count{_format_labels(labels)} {_format_value(values.get('count', 0))}")
+    return lines
+
+
+registry = MetricsRegistry()
+
+# -----------------------------------------------------------------------
+# MÉTRICAS DE LA APP
+# -----------------------------------------------------------------------
+
+http_requests_total = registry.counter(
+    "http_requests_total", "Requests HTTP atendidos, por método, ruta y status."
+)
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "Latencia de los requests HTTP por método y ruta."
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "Requests HTTP en curso, por método."
+)
+
+ics_feeds_served_total = registry.counter(
+    "eventease_ics_feeds_served_total", "Feeds ICS entregados con cuerpo, por origen (cache|stream)."
+)
+ics_not_modified_total = registry.counter(
+    "eventease_ics_not_modified_total", "Requests de feeds ICS respondidos con 304."
+)
+fanout_invitations_total = registry.counter(
+    "eventease_fanout_invitations_total", "Invitaciones a eventos creadas por INSERT ... SELECT (usuarios y equipos)."
+)
+bcrypt_operations_total = registry.counter(
+    "eventease_bcrypt_operations_total", "Operaciones de bcrypt, por tipo (hash|check)."
+)
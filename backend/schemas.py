@@ -81,6 +81,18 @@ class InvitationOut(BaseModel):
     class Config:
         from_attributes = True
 
+class CalendarEventOut(BaseModel):
+    id: int
+    title: str
+    date: date
+    time: dtime
+    endtime: Optional[dtime] = None
+    location: Optional[str] = None
+    description: Optional[str] = None
+    host: Optional[str] = None
+    source: str                     # "own" | "invited"
+    rsvp: Optional[str] = None      # solo para "invited"
+
 class EventCreate(BaseModel):
     title: str
     date: date
@@ -154,3 +166,20 @@ class EventInviteUserRequest(BaseModel):
 
 class EventInviteTeamRequest(BaseModel):
     team_id: int
+
+
+class BadgeCounts(BaseModel):
+    event_invitations: int
+    friend_requests: int
+    team_invitations: int
+
+
+class DashboardOut(BaseModel):
+    # Las secciones no pedidas en ?fields= quedan fuera de la respuesta
+    events: Optional[List[EventOut]] = None
+    events_next_cursor: Optional[str] = None
+    invitations: Optional[List[InvitationOut]] = None
+    invitations_next_cursor: Optional[str] = None
+    friend_requests: Optional[List[IncomingFriendRequestOut]] = None
+    team_invitations: Optional[List[TeamInvitationOut]] = None
+    counts: Optional[BadgeCounts] = None
@@ -0,0 +1,434 @@
+"""
+Generador de datos sintéticos para pruebas de capacidad.
+
+Resetea la BD (como seed_demo_data) y la llena con usuarios, contactos,
+equipos, eventos e invitaciones según los parámetros. Las filas se generan
+en streaming y se cargan por lotes: COPY en Postgres (psycopg2 / psycopg),
+INSERT multi-fila en el resto. Todo sale de un random.Random(seed), así que
+la misma semilla (y --anchor-date) da los mismos datos en cualquier máquina.
+
+    python synthetic_data.py --users 100000 --events-per-user 5 --fanout 20
+    python synthetic_data.py --users 1000000 --contacts-per-user 30 --seed 7
+    python synthetic_data.py --with-demo --users 5000   # + datos de seed_demo_data
+
+Todos los usuarios tienen la contraseña --password y el email
+user<id con 7 dígitos>@synthetic.example.com.
+"""
+import argparse
+import csv
+import io
+import random
+import sys
+from base64 import urlsafe_b64encode
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+
+from sqlalchemy import func, select, text
+
+from base import (
+    Contact,
+    Event,
+    EventInvitation,
+    EventInviteLink,
+    Team,
+    TeamMember,
+    User,
+    INVITE_LINK_PREFIX,
+    engine,
+    hash_password,
+    init_db,
+    reset_db,
+    seed_demo_data,
+)
+
+SYNTHETIC_EMAIL = "user{:07d}@synthetic.example.com"
+DEFAULT_PASSWORD = "synthetic1234"
+
+FIRST_NAMES = (
+    "Ana", "Bruno", "Carla", "Diego", "Elena", "Felipe", "Gabriela", "Hugo", "Isabel", "Javier",
+    "Karen", "Luis", "María", "Nicolás", "Olivia", "Pablo", "Rocío", "Sergio", "Tamara", "Valentina",
+)
+LAST_NAMES = (
+    "Álvarez", "Castro", "Díaz", "Fernández", "García", "González", "López", "Martínez", "Morales",
+    "Muñoz", "Pérez", "Rodríguez", "Rojas", "Sánchez", "Silva", "Soto", "Torres", "Vargas",
+)
+TIMEZONES = (
+    None, "America/Santiago", "America/Argentina/Buenos_Aires", "America/Mexico_City",
+    "America/Bogota", "Europe/Madrid", "UTC",
+)
+EVENT_TITLES = (
+    "Reunión de equipo", "Cumpleaños", "Asado", "Planificación", "Demo", "Retro",
+    "Almuerzo", "Partido", "Taller", "Cena", "Presentación", "Viaje",
+)
+LOCATIONS = (None, "Oficina", "Online", "Parque", "Casa", "Auditorio", "Café")
+
+# Orden de carga: respeta las FKs
+TABLES = (User, Contact, Team, TeamMember, Event, EventInviteLink, EventInvitation)
+
+
+def parse_distribution(spec: str) -> dict[str, float]:
+    """'pending=0.5,accepted=0.35,rejected=0.15' -> pesos normalizados."""
+    weights: dict[str, float] = {}
+    for part in spec.split(","):
+        status, _, weight = part.partition("=")
+        if status.strip() not in ("pending", "accepted", "rejected"):
+            raise ValueError(f"Unknown RSVP status: {status!r}")
+        weights[status.strip()] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("RSVP distribution must have a positive total")
+    return {status: weight / total for status, weight in weights.items()}
+
+
+# -----------------------------------------------------------------------
+# CARGA POR LOTES
+# -----------------------------------------------------------------------
+
+class BatchLoader:
+    """
+    Junta filas por tabla y las escribe de a `batch_size`. Los ids vienen
+    dados (el generador los asigna), así que no hace falta RETURNING y en
+    Postgres se puede usar COPY; al final se ajustan las secuencias.
+    """
+
+    def __init__(self, conn, batch_size: int):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.dialect = conn.dialect.name
+        self.driver = conn.dialect.driver
+        self.rows: dict[str, list[dict]] = {}
+        self.counts: dict[str, int] = {}
+
+    def add(self, model, row: dict) -> None:
+        table = model.__table__.name
+        batch = self.rows.setdefault(table, [])
+        batch.append(row)
+        if len(batch) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model) -> None:
+        table = model.__table__
+        batch = self.rows.pop(table.name, None)
+        if not batch:
+            return
+        if self.dialect == "postgresql" and self.driver in ("psycopg2", "psycopg"):
+            self._copy(table, batch)
+        else:
+            self.conn.execute(table.insert(), batch)
+        self.counts[table.name] = self.counts.get(table.name, 0) + len(batch)
+
+    def _copy(self, table, batch: list[dict]) -> None:
+        columns = list(batch[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            writer.writerow([_copy_value(row[c]) for c in columns])
+        buffer.seek(0)
+
+        sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        cursor = self.conn.connection.cursor()
+        try:
+            if self.driver == "psycopg2":
+                cursor.copy_expert(sql, buffer)
+            else:
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+        finally:
+            cursor.close()
+
+    def reset_sequences(self) -> None:
+        if self.dialect != "postgresql":
+            return
+        for model in TABLES:
+            name = model.__table__.name
+            self.conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {name}), 1))"
+            ))
+
+
+def _copy_value(value):
+    # en COPY csv, None sale como campo vacío sin comillas = NULL
+    if isinstance(value, bytes):
+        return "\\x" + value.hex()
+    return value
+
+
+# -----------------------------------------------------------------------
+# GENERADOR
+# -----------------------------------------------------------------------
+
+class SyntheticDataGenerator:
+    def __init__(
+        self,
+        users: int,
+        contacts_per_user: int,
+        pending_contacts: float,
+        teams: int,
+        team_size: int,
+        events_per_user: int,
+        fanout: int,
+        rsvp: dict[str, float],
+        days_past: int,
+        days_future: int,
+        password_hash: bytes,
+        seed: int,
+        anchor: date,
+        id_offsets: dict[str, int] | None = None,
+    ):
+        self.users = users
+        self.contacts_per_user = contacts_per_user
+        self.pending_contacts = pending_contacts
+        self.teams = teams
+        self.team_size = team_size
+        self.events_per_user = events_per_user
+        self.fanout = fanout
+        self.rsvp_statuses = list(rsvp)
+        self.rsvp_weights = list(rsvp.values())
+        self.days_past = days_past
+        self.days_future = days_future
+        self.password_hash = password_hash
+        self.rng = random.Random(seed)
+        self.offsets = id_offsets or {}
+        # Fechas de eventos relativas a `anchor` (por defecto, hoy) para que
+        # siempre caigan en las ventanas del calendario y del feed ICS
+        self.today = anchor
+        self.now = datetime.combine(anchor, time(0, 0))
+
+    def _next_id(self, model) -> int:
+        name = model.__table__.name
+        self.offsets[name] = self.offsets.get(name, 0) + 1
+        return self.offsets[name]
+
+    def _user_id(self, index: int) -> int:
+        # index 0..users-1 -> id real (después de los usuarios demo, si hay)
+        return self.first_user_id + index
+
+    def _token(self) -> str:
+        return urlsafe_b64encode(self.rng.randbytes(16)).rstrip(b"=").decode()
+
+    def _sample_users(self, k: int, exclude: int) -> list[int]:
+        k = min(k, self.users - 1)
+        picked = [self._user_id(i) for i in self.rng.sample(range(self.users), k + 1)]
+        return [u for u in picked if u != exclude][:k]
+
+    def generate(self, loader: BatchLoader) -> None:
+        self.first_user_id = self.offsets.get(User.__table__.name, 0) + 1
+        self._users(loader)
+        self._contacts(loader)
+        self._teams(loader)
+        self._events(loader)
+
+    def _users(self, loader: BatchLoader) -> None:
+        for _ in range(self.users):
+            user_id = self._next_id(User)
+            loader.add(User, {
+                "id": user_id,
+                "name": f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}",
+                "email": SYNTHETIC_EMAIL.format(user_id),
+                "password_hash": self.password_hash,
+                "calendar_token": self._token(),
+                "timezone": self.rng.choice(TIMEZONES),
+                "created_at": self.now,
+                "updated_at": self.now,
+            })
+        loader.flush(User)
+
+    def _contacts(self, loader: BatchLoader) -> None:
+        """
+        Cada usuario i se conecta con i + o (mod users) para un conjunto fijo de
+        offsets distintos en [1, users/2): ningún par se repite y cada usuario
+        queda con ~contacts_per_user contactos sin guardar nada en memoria.
+        """
+        max_offset = (self.users - 1) // 2
+        pairs = min(self.contacts_per_user // 2, max_offset)
+        if pairs <= 0:
+            return
+        offsets = self.rng.sample(range(1, max_offset + 1), pairs)
+
+        for i in range(self.users):
+            for offset in offsets:
+                a, b = self._user_id(i), self._user_id((i + offset) % self.users)
+                if self.rng.random() < self.pending_contacts:
+                    # solicitud pendiente: solo la fila del que la envió
+                    loader.add(Contact, self._contact(a, b, "pending"))
+                else:
+                    loader.add(Contact, self._contact(a, b, "accepted"))
+                    loader.add(Contact, self._contact(b, a, "accepted"))
+        loader.flush(Contact)
+
+    def _contact(self, user_id: int, contact_id: int, status: str) -> dict:
+        return {
+            "id": self._next_id(Contact),
+            "user_id": user_id,
+            "contact_id": contact_id,
+            "status": status,
+            "created_at": self.now,
+        }
+
+    def _teams(self, loader: BatchLoader) -> None:
+        memberships = []
+        for _ in range(self.teams):
+            team_id = self._next_id(Team)
+            owner_id = self._user_id(self.rng.randrange(self.users))
+            loader.add(Team, {
+                "id": team_id,
+                "owner_id": owner_id,
+                "name": f"Equipo {team_id}",
+                "description": None,
+                "created_at": self.now,
+                "updated_at": self.now,
+            })
+            size = self.rng.randint(1, max(1, 2 * self.team_size - 1))
+            memberships.append((team_id, owner_id, size))
+        loader.flush(Team)
+
+        for team_id, owner_id, size in memberships:
+            # el owner es miembro aceptado con role="owner", como en create_team
+            loader.add(TeamMember, {
+                "id": self._next_id(TeamMember),
+                "team_id": team_id,
+                "user_id": owner_id,
+                "role": "owner",
+                "status": "accepted",
+                "created_at": self.now,
+            })
+            for user_id in self._sample_users(size - 1, exclude=owner_id):
+                loader.add(TeamMember, {
+                    "id": self._next_id(TeamMember),
+                    "team_id": team_id,
+                    "user_id": user_id,
+                    "role": "member",
+                    "status": "accepted" if self.rng.random() < 0.9 else "pending",
+                    "created_at": self.now,
+                })
+        loader.flush(TeamMember)
+
+    def _events(self, loader: BatchLoader) -> None:
+        today = self.today
+        fanouts = []
+        for i in range(self.users):
+            owner_id = self._user_id(i)
+            for _ in range(self.events_per_user):
+                event_id = self._next_id(Event)
+                token = self._token()
+                start_hour = self.rng.randint(7, 21)
+                loader.add(Event, {
+                    "id": event_id,
+                    "owner_id": owner_id,
+                    "title": self.rng.choice(EVENT_TITLES),
+                    "description": None,
+                    "location": self.rng.choice(LOCATIONS),
+                    "event_url": f"{INVITE_LINK_PREFIX}{token}",
+                    "date": today + timedelta(days=self.rng.randint(-self.days_past, self.days_future)),
+                    "time": time(start_hour, self.rng.choice((0, 15, 30, 45))),
+                    "endtime": time(min(start_hour + self.rng.randint(1, 2), 23), 0),
+                    "created_at": self.now,
+                    "updated_at": self.now,
+                })
+                loader.add(EventInviteLink, {
+                    "id": self._next_id(EventInviteLink),
+                    "event_id": event_id,
+                    "token": token,
+                    "expires_at": None,
+                    "max_uses": None,
+                    "use_count": 0,
+                    "created_at": self.now,
+                })
+                fanouts.append((event_id, owner_id, self.rng.randint(0, 2 * self.fanout)))
+                if len(fanouts) >= loader.batch_size:
+                    self._flush_events(loader, fanouts)
+        self._flush_events(loader, fanouts)
+
+    def _flush_events(self, loader: BatchLoader, fanouts: list) -> None:
+        # las invitaciones van después de sus eventos (FK)
+        loader.flush(Event)
+        loader.flush(EventInviteLink)
+        for event_id, owner_id, size in fanouts:
+            for user_id in self._sample_users(size, exclude=owner_id):
+                loader.add(EventInvitation, {
+                    "id": self._next_id(EventInvitation),
+                    "event_id": event_id,
+                    "user_id": user_id,
+                    "status": self.rng.choices(self.rsvp_statuses, self.rsvp_weights)[0],
+                    "created_at": self.now,
+                })
+        loader.flush(EventInvitation)
+        fanouts.clear()
+
+
+def _current_max_ids(conn) -> dict[str, int]:
+    return {
+        model.__table__.name: conn.execute(select(func.coalesce(func.max(model.id), 0))).scalar_one()
+        for model in TABLES
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--contacts-per-user", type=int, default=20)
+    parser.add_argument("--pending-contacts", type=float, default=0.1,
+                        help="fracción de pares de contactos que quedan como solicitud pendiente")
+    parser.add_argument("--teams", type=int, default=None, help="default: users / 10")
+    parser.add_argument("--team-size", type=int, default=8, help="tamaño medio de equipo, owner incluido")
+    parser.add_argument("--events-per-user", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=10, help="invitados medios por evento")
+    parser.add_argument("--rsvp", default="pending=0.5,accepted=0.35,rejected=0.15",
+                        help="distribución de estados de las invitaciones")
+    parser.add_argument("--days-past", type=int, default=30)
+    parser.add_argument("--days-future", type=int, default=120)
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor-date", type=date.fromisoformat, default=None,
+                        help="día de referencia de las fechas (default: hoy)")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--with-demo", action="store_true", help="carga primero seed_demo_data()")
+    args = parser.parse_args(argv)
+
+    if args.users < 2:
+        parser.error("--users must be at least 2")
+    try:
+        rsvp = parse_distribution(args.rsvp)
+    except ValueError as e:
+        parser.error(str(e))
+
+    started = perf_counter()
+    if args.with_demo:
+        seed_demo_data()
+    else:
+        reset_db()
+        init_db()
+
+    with engine.begin() as conn:
+        generator = SyntheticDataGenerator(
+            users=args.users,
+            contacts_per_user=args.contacts_per_user,
+            pending_contacts=args.pending_contacts,
+            teams=args.teams if args.teams is not None else args.users // 10,
+            team_size=args.team_size,
+            events_per_user=args.events_per_user,
+            fanout=args.fanout,
+            rsvp=rsvp,
+            days_past=args.days_past,
+            days_future=args.days_future,
+            password_hash=hash_password(args.password),
+            seed=args.seed,
+            anchor=args.anchor_date or date.today(),
+            # con --with-demo los ids sintéticos siguen a los de la demo
+            id_offsets=_current_max_ids(conn),
+        )
+        loader = BatchLoader(conn, args.batch_size)
+        generator.generate(loader)
+        loader.reset_sequences()
+
+    elapsed = perf_counter() - started
+    total = sum(loader.counts.values())
+    for table, count in loader.counts.items():
+        print(f"{table:20} {count:>12,}")
+    print(f"{total:,} filas en {elapsed:.1f}s ({total / elapsed:,.0f} filas/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
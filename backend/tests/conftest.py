@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+# Los módulos del backend se importan planos (import base, import api)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Antes de que los tests importen base/api: la URL y el cost de bcrypt se leen
+# al importar, y con SLOW_REQUEST_MS=0 el middleware de api.py loguea cada
+# request con sus statements (eso es lo que cuenta test_query_budget).
+os.environ["DATABASE_URL"] = os.environ.get("QUERY_BUDGET_DATABASE_URL") or (
+    "sqlite:///" + os.path.join(tempfile.gettempdir(), "eventease_query_budget.db")
+)
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ["SLOW_REQUEST_MS"] = "0"
@@ -0,0 +1,395 @@
+"""
+Presupuesto de queries por endpoint.
+
+Siembra una BD con fixtures a escala (1, 100 y 10.000 invitados, miembros y
+contactos), recorre todas las rutas de api.py con el cliente ASGI en proceso
+y falla si algún request ejecuta más statements SQL que su presupuesto. Los
+presupuestos no dependen de la escala: un N+1 reintroducido en cualquier
+handler se pasa del límite ya en la escala de 100 y el fallo lista sus
+statements. Hay un test por (escala, ruta).
+
+La configuración de CI es Postgres, el mismo motor que producción: ahí se
+fijaron los presupuestos y es donde un N+1 cuesta de verdad. Sin
+QUERY_BUDGET_DATABASE_URL apuntando a Postgres el módulo falla al
+recolectarse; QUERY_BUDGET_SQLITE=1 lo deja correr contra un SQLite temporal
+como chequeo local rápido.
+
+    QUERY_BUDGET_DATABASE_URL=postgresql+psycopg2://... pytest tests/test_query_budget.py
+    QUERY_BUDGET_DATABASE_URL=... DB_ASYNC=1 pytest tests/test_query_budget.py   # rutas async
+    QUERY_BUDGET_SQLITE=1 QUERY_BUDGET_SCALES=1,100 pytest tests/test_query_budget.py
+
+La BD se borra y se vuelve a crear en cada escala: no apuntarlo a una base
+con datos.
+"""
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+import functools
+from typing import NamedTuple
+
+import pytest
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+import base
+from base import (
+    Contact,
+    Event,
+    EventInvitation,
+    Team,
+    TeamMember,
+    User,
+    INVITE_LINK_PREFIX,
+    backfill_invite_links,
+    get_session_cm,
+    hash_password,
+    init_db,
+    reset_db,
+)
+import api
+
+if base.engine.dialect.name != "postgresql" and os.environ.get("QUERY_BUDGET_SQLITE") != "1":
+    pytest.fail(
+        f"test_query_budget necesita Postgres (QUERY_BUDGET_DATABASE_URL); la BD es "
+        f"{base.engine.dialect.name}. QUERY_BUDGET_SQLITE=1 para un chequeo local.",
+        pytrace=False,
+    )
+
+
+SCALES = [int(n) for n in os.environ.get("QUERY_BUDGET_SCALES", "1,100,10000").split(",")]
+PASSWORD = "budget1234"
+
+# (método, ruta) -> máximo de statements SQL por request, con las caches frías.
+# Son los conteos actuales en Postgres (iguales en sync y async, y en SQLite):
+# si un cambio agrega una query a propósito, se sube acá en el mismo commit.
+BUDGETS: dict[tuple[str, str], int] = {
+    ("POST", "/api/auth/register"): 4,
+    ("POST", "/api/auth/login"): 1,
+    ("GET", "/api/auth/me"): 1,
+    ("POST", "/api/auth/me/timezone"): 4,
+    ("POST", "/api/auth/logout"): 0,
+    ("GET", "/api/calendar/ics-url"): 2,
+    ("GET", "/api/calendar/{token}.ics"): 3,
+    ("GET", "/api/calendar/range"): 2,
+    ("GET", "/api/my-events"): 3,
+    ("GET", "/api/my-invitations"): 2,
+    ("GET", "/api/dashboard"): 7,
+    ("GET", "/api/counts"): 2,
+    ("GET", "/api/teams/owned"): 2,
+    ("GET", "/api/teams/mine"): 2,
+    ("GET", "/api/teams/invitations"): 2,
+    ("GET", "/api/teams/{team_id}/members"): 3,
+    ("GET", "/api/users/search"): 2,
+    ("GET", "/api/contacts/search"): 2,
+    ("GET", "/api/teams/search"): 2,
+    ("GET", "/api/friend-requests/received"): 2,
+    ("GET", "/api/contacts"): 2,
+    ("POST", "/api/events"): 8,
+    ("POST", "/api/events/{event_id}/invite-user"): 5,
+    ("POST", "/api/invitations/{invitation_id}/accept"): 6,
+    ("POST", "/api/invitations/{invitation_id}/reject"): 5,
+    ("DELETE", "/api/invitations/{invitation_id}"): 3,
+    ("POST", "/api/invite-links/{token}/accept"): 8,
+    ("POST", "/api/teams"): 6,
+    ("PATCH", "/api/teams/{team_id}"): 6,
+    ("POST", "/api/teams/{team_id}/invite"): 5,
+    ("POST", "/api/teams/{team_id}/accept-invite"): 4,
+    ("POST", "/api/teams/{team_id}/reject-invite"): 3,
+    ("DELETE", "/api/teams/{team_id}/members/me"): 3,
+    ("DELETE", "/api/teams/{team_id}/members/{user_id}"): 4,
+    ("POST", "/api/friend-requests"): 4,
+    ("POST", "/api/friend-requests/{request_id}/accept"): 7,
+    ("POST", "/api/friend-requests/{request_id}/reject"): 4,
+    ("DELETE", "/api/contacts/{contact_user_id}"): 4,
+    ("DELETE", "/api/events/{event_id}"): 6,
+    ("DELETE", "/api/teams/{team_id}"): 5,
+}
+
+# Rutas que no pasan por el presupuesto
+EXEMPT = {
+    ("GET", "/api/stream"): "SSE, la respuesta no termina",
+    ("GET", "/metrics"): "no toca la BD",
+}
+
+
+# -----------------------------------------------------------------------
+# FIXTURES
+# -----------------------------------------------------------------------
+
+def _bulk_insert(db, model, rows: list[dict]) -> list[int]:
+    """INSERT multi-fila; devuelve los ids en el orden de `rows`."""
+    if not rows:
+        return []
+    stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+    return list(db.scalars(stmt, rows))
+
+
+def seed_fixture(n: int) -> dict:
+    """
+    Un usuario "owner" con n contactos aceptados, n solicitudes pendientes,
+    un equipo propio de n miembros, un evento propio con n invitados y
+    n eventos ajenos a los que está invitado. Devuelve los ids que usa el plan.
+    """
+    reset_db()
+    init_db()
+
+    now = datetime.utcnow()
+    today = now.date()
+    password_hash = hash_password(PASSWORD)
+    # algunos pasos necesitan al menos 2-3 filas aunque la escala sea 1
+    m = max(n, 3)
+
+    def user_rows(prefix: str, count: int) -> list[dict]:
+        return [
+            {
+                "name": f"{prefix.title()} {i:05d}",
+                "email": f"{prefix}{i:05d}@budget.example.com",
+                "password_hash": password_hash,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(count)
+        ]
+
+    with get_session_cm() as db:
+        owner_id, stranger_id = _bulk_insert(db, User, [
+            {
+                "name": "Budget Owner", "email": "owner@budget.example.com", "password_hash": password_hash,
+                "calendar_token": "budget-calendar-token", "created_at": now, "updated_at": now,
+            },
+            {"name": "Stranger", "email": "stranger@budget.example.com", "password_hash": password_hash,
+             "created_at": now, "updated_at": now},
+        ])
+        friends = _bulk_insert(db, User, user_rows("friend", n))
+        requesters = _bulk_insert(db, User, user_rows("requester", m))
+
+        _bulk_insert(db, Contact, [
+            {"user_id": a, "contact_id": b, "status": "accepted", "created_at": now}
+            for friend_id in friends
+            for a, b in ((owner_id, friend_id), (friend_id, owner_id))
+        ])
+        requests = _bulk_insert(db, Contact, [
+            {"user_id": requester_id, "contact_id": owner_id, "status": "pending", "created_at": now}
+            for requester_id in requesters
+        ])
+
+        team_id, = _bulk_insert(db, Team, [
+            {"owner_id": owner_id, "name": "Budget team", "created_at": now, "updated_at": now}
+        ])
+        _bulk_insert(db, TeamMember, [
+            {"team_id": team_id, "user_id": friend_id, "role": "member", "status": "accepted", "created_at": now}
+            for friend_id in friends
+        ])
+        invited_teams = _bulk_insert(db, Team, [
+            {"owner_id": requester_id, "name": f"Team {i:05d}", "created_at": now, "updated_at": now}
+            for i, requester_id in enumerate(requesters)
+        ])
+        _bulk_insert(db, TeamMember, [
+            {"team_id": t, "user_id": owner_id, "role": "member", "status": "pending", "created_at": now}
+            for t in invited_teams
+        ])
+
+        def event_row(owner: int, i: int, title: str) -> dict:
+            return {
+                "owner_id": owner,
+                "title": f"{title} {i:05d}",
+                "date": today + timedelta(days=i % 90),
+                "time": datetime.min.time().replace(hour=9 + i % 10),
+                "event_url": f"{INVITE_LINK_PREFIX}budget-{title.lower()}-{i:05d}",
+                "created_at": now,
+                "updated_at": now,
+            }
+
+        own_events = _bulk_insert(db, Event, [event_row(owner_id, i, "Own") for i in range(n)])
+        big_event_id = own_events[0]
+        _bulk_insert(db, EventInvitation, [
+            {"event_id": big_event_id, "user_id": friend_id,
+             "status": ("pending", "accepted", "rejected")[i % 3], "created_at": now}
+            for i, friend_id in enumerate(friends)
+        ])
+        guest_events = _bulk_insert(db, Event, [
+            event_row(friends[i % n], i, "Guest") for i in range(m)
+        ])
+        invitations = _bulk_insert(db, EventInvitation, [
+            {"event_id": event_id, "user_id": owner_id,
+             "status": "accepted" if i % 2 else "pending", "created_at": now}
+            for i, event_id in enumerate(guest_events)
+        ])
+        link_event_id, = _bulk_insert(db, Event, [event_row(requesters[0], 0, "Link")])
+        backfill_invite_links(db)
+
+    return {
+        "n": n,
+        "owner_id": owner_id,
+        "stranger_id": stranger_id,
+        "friends": friends,
+        "requesters": requesters,
+        "requests": requests,
+        "team_id": team_id,
+        "invited_teams": invited_teams,
+        "big_event_id": big_event_id,
+        "invitations": invitations,
+        "link_token": f"budget-link-{0:05d}",
+        "calendar_token": "budget-calendar-token",
+        "today": today,
+    }
+
+
+# -----------------------------------------------------------------------
+# PLAN
+# -----------------------------------------------------------------------
+
+def request_plan(fx: dict) -> list[tuple[str, str, dict]]:
+    """
+    (método, path, kwargs del cliente) en el orden en que se ejecutan: primero
+    lecturas, después mutaciones, y al final las que borran las filas a escala.
+    """
+    today = fx["today"]
+    friends, requesters = fx["friends"], fx["requesters"]
+    team_id, invited_teams = fx["team_id"], fx["invited_teams"]
+    invitations, requests = fx["invitations"], fx["requests"]
+
+    return [
+        ("POST", "/api/auth/register", {"json": {"name": "New", "email": "new@budget.example.com", "password": PASSWORD}}),
+        ("POST", "/api/auth/login", {"json": {"email": "owner@budget.example.com", "password": PASSWORD}}),
+        ("GET", "/api/auth/me", {}),
+        ("POST", "/api/auth/me/timezone", {"json": {"timezone": "America/Santiago"}}),
+        ("GET", "/api/calendar/ics-url", {}),
+        ("GET", f"/api/calendar/{fx['calendar_token']}.ics", {}),
+        ("GET", "/api/calendar/range", {"params": {
+            "from": today.isoformat(), "to": (today + timedelta(days=90)).isoformat(), "include_pending": "true",
+        }}),
+        ("GET", "/api/my-events", {}),
+        ("GET", "/api/my-invitations", {}),
+        ("GET", "/api/dashboard", {}),
+        ("GET", "/api/counts", {}),
+        ("GET", "/api/teams/owned", {}),
+        ("GET", "/api/teams/mine", {}),
+        ("GET", "/api/teams/invitations", {}),
+        ("GET", f"/api/teams/{team_id}/members", {}),
+        ("GET", "/api/users/search", {"params": {"email": "stranger@budget.example.com"}}),
+        ("GET", "/api/contacts/search", {"params": {"q": "fri"}}),
+        ("GET", "/api/teams/search", {"params": {"q": "bud"}}),
+        ("GET", "/api/friend-requests/received", {}),
+        ("GET", "/api/contacts", {}),
+        ("POST", "/api/events", {"json": {
+            "title": "Fan-out", "date": (today + timedelta(days=3)).isoformat(),
+            "time": "10:00", "endtime": "11:00",
+            "contact_ids": friends, "team_ids": [team_id],
+        }}),
+        ("POST", f"/api/events/{fx['big_event_id']}/invite-user", {"json": {"user_id": requesters[0]}}),
+        ("POST", f"/api/invitations/{invitations[0]}/accept", {}),
+        ("POST", f"/api/invitations/{invitations[2]}/reject", {}),
+        ("DELETE", f"/api/invitations/{invitations[1]}", {}),
+        ("POST", f"/api/invite-links/{fx['link_token']}/accept", {}),
+        ("POST", "/api/teams", {"json": {"name": "Another team"}}),
+        ("PATCH", f"/api/teams/{team_id}", {"json": {"description": "updated"}}),
+        ("POST", f"/api/teams/{team_id}/invite", {"json": {"user_id": requesters[1]}}),
+        ("POST", f"/api/teams/{invited_teams[0]}/accept-invite", {}),
+        ("POST", f"/api/teams/{invited_teams[1]}/reject-invite", {}),
+        ("DELETE", f"/api/teams/{invited_teams[0]}/members/me", {}),
+        ("DELETE", f"/api/teams/{team_id}/members/{friends[0]}", {}),
+        ("POST", "/api/friend-requests", {"json": {"target_user_id": fx["stranger_id"]}}),
+        ("POST", f"/api/friend-requests/{requests[0]}/accept", {}),
+        ("POST", f"/api/friend-requests/{requests[1]}/reject", {}),
+        ("DELETE", f"/api/contacts/{friends[-1]}", {}),
+        ("DELETE", f"/api/events/{fx['big_event_id']}", {}),
+        ("DELETE", f"/api/teams/{team_id}", {}),
+        ("POST", "/api/auth/logout", {}),
+    ]
+
+
+def _clear_caches() -> None:
+    # Presupuesto con caches frías: es el peor caso de cada request
+    for cache in (
+        base.user_identity_cache,
+        base.badge_counts_cache,
+        base.typeahead_cache,
+        base.invite_link_cache,
+        base.ics_feed_cache,
+    ):
+        cache.clear()
+
+
+class _RequestLog(logging.Handler):
+    """Guarda la línea JSON que deja QueryStatsMiddleware por cada request."""
+
+    def __init__(self):
+        super().__init__()
+        self.records: list[dict] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(json.loads(record.getMessage()))
+
+
+# -----------------------------------------------------------------------
+# RUNNER
+# -----------------------------------------------------------------------
+
+def unbudgeted_routes() -> list[tuple[str, str]]:
+    missing = []
+    for route in api.app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        for method in route.methods - {"HEAD"}:
+            key = (method, route.path)
+            if key not in BUDGETS and key not in EXEMPT:
+                missing.append(key)
+    return sorted(missing)
+
+
+class Measured(NamedTuple):
+    # ruta -> (statements, sql de cada uno) del request que la ejecutó
+    queries: dict[tuple[str, str], tuple[int, list[str]]]
+    # requests que respondieron con error, con el path concreto
+    errors: dict[tuple[str, str], str]
+
+
+@functools.cache
+def measure_scale(n: int) -> Measured:
+    """Siembra la escala n y corre el plan completo; se mide una vez por escala."""
+    fx = seed_fixture(n)
+    log = _RequestLog()
+    measured = Measured({}, {})
+
+    api.sql_logger.addHandler(log)
+    api.sql_logger.propagate = False
+    try:
+        with TestClient(api.app) as client:
+            for method, path, kwargs in request_plan(fx):
+                _clear_caches()
+                log.records.clear()
+                response = client.request(method, path, **kwargs)
+                record = log.records[-1]
+                key = (method, record["route"])
+                if response.status_code >= 400:
+                    measured.errors[key] = f"{path} -> {response.status_code}: {response.text[:200]}"
+                    continue
+                statements = [" ".join(st["sql"].split()) for st in record.get("statements", [])]
+                measured.queries[key] = (record["db_queries"], statements)
+    finally:
+        api.sql_logger.removeHandler(log)
+        api.sql_logger.propagate = True
+    return measured
+
+
+# -----------------------------------------------------------------------
+# TESTS
+# -----------------------------------------------------------------------
+
+def test_every_route_has_a_budget():
+    assert unbudgeted_routes() == []
+
+
+@pytest.mark.parametrize("route", sorted(BUDGETS), ids=lambda key: f"{key[0]} {key[1]}")
+@pytest.mark.parametrize("n", SCALES, ids=lambda n: f"n={n}")
+def test_query_budget(n: int, route: tuple[str, str]):
+    measured = measure_scale(n)
+    assert route not in measured.errors, measured.errors.get(route)
+    assert route in measured.queries, "el plan no ejecutó la ruta"
+
+    used, statements = measured.queries[route]
+    budget = BUDGETS[route]
+    assert used <= budget, f"{used} statements (presupuesto {budget}):\n" + "\n".join(statements)
@@ -48,6 +48,9 @@ export default function AppHome() {
     const [active, setActive] = useState(0);
     const [events, setEvents] = useState([]);
     const [invites, setInvites] = useState([]);
+    const [friendRequests, setFriendRequests] = useState([]);
+    const [teamInvites, setTeamInvites] = useState([]);
+    const [loadingData, setLoadingData] = useState(false);
     const [toastMsg, setToastMsg] = useState("");
     const [toastShown, setToastShown] = useState(false);
     const [highlightInviteId, setHighlightInviteId] = useState(null);
@@ -109,14 +112,29 @@ export default function AppHome() {
         showToast._clear = setTimeout(() => setToastMsg(""), ms + 300);
     };
 
+    // Las listas vienen paginadas: se siguen los X-Next-Cursor hasta el final
+    const fetchAllPages = async (path, cursor = null) => {
+        const items = [];
+        while (true) {
+            const params = new URLSearchParams({ include_past: "true", limit: "500" });
+            if (cursor) params.set("cursor", cursor);
+            const res = await fetch(`${API_BASE}${path}?${params}`, { credentials: "include" });
+            if (!res.ok) return { res, items };
+            items.push(...((await res.json()) || []));
+            cursor = res.headers.get("X-Next-Cursor");
+            if (!cursor) return { res, items };
+        }
+    };
+
+    // Inicio: /dashboard trae eventos, invitaciones, solicitudes de amistad
+    // e invitaciones a equipos en un solo request
     const fetchData = async () => {
+        setLoadingData(true);
         try {
-            const [evRes, invRes] = await Promise.all([
-                fetch(`${API_BASE}/my-events`, { credentials: "include" }),
-                fetch(`${API_BASE}/my-invitations`, { credentials: "include" }),
-            ]);
+            const params = new URLSearchParams({ include_past: "true", limit: "500" });
+            const res = await fetch(`${API_BASE}/dashboard?${params}`, { credentials: "include" });
 
-            if (evRes.status === 401 || invRes.status === 401) {
+            if (res.status === 401) {
                 localStorage.removeItem("ee_auth");
                 window.location.href = `/auth/login?redirect=${encodeURIComponent(
                     window.location.pathname
@@ -124,24 +142,32 @@ export default function AppHome() {
                 return;
             }
 
-            if (!evRes.ok || !invRes.ok) {
-                const evText = await evRes.text();
-                const invText = await invRes.text();
-                console.error("evRes body:", evText);
-                console.error("invRes body:", invText);
+            if (!res.ok) {
+                console.error("dashboard body:", await res.text());
                 throw new Error("No se pudieron obtener datos");
             }
 
-            const [evData, invData] = await Promise.all([
-                evRes.json(),
-                invRes.json(),
+            const data = await res.json();
+
+            // Si alguna lista no entró en una página, se completa con su endpoint
+            const [moreEvents, moreInvites] = await Promise.all([
+                data.events_next_cursor
+                    ? fetchAllPages("/my-events", data.events_next_cursor)
+                    : { items: [] },
+                data.invitations_next_cursor
+                    ? fetchAllPages("/my-invitations", data.invitations_next_cursor)
+                    : { items: [] },
             ]);
 
-            setEvents(evData || []);
-            setInvites(invData || []);
+            setEvents([...(data.events || []), ...moreEvents.items]);
+            setInvites([...(data.invitations || []), ...moreInvites.items]);
+            setFriendRequests(data.friend_requests || []);
+            setTeamInvites(data.team_invitations || []);
         } catch (err) {
             console.error("fetchData error:", err);
             showToast("Error cargando datos");
+        } finally {
+            setLoadingData(false);
         }
     };
 
@@ -150,11 +176,56 @@ export default function AppHome() {
         fetchData();
     }, []);
 
+    // Cambios en vivo (invitaciones, RSVPs, solicitudes) por /stream (SSE).
+    // Mientras el stream está conectado, Mis eventos e Invitaciones no se
+    // recargan al cambiar de pestaña; Inicio sí, porque también refleja lo
+    // que el usuario acepta desde Personas y Equipos.
+    const [streamLive, setStreamLive] = useState(false);
+    const streamDropped = useRef(false);
+
     useEffect(() => {
-        if (active === 0 || active === 2 || active === 3) {
+        if (typeof EventSource === "undefined") return;
+
+        const es = new EventSource(`${API_BASE}/stream`, { withCredentials: true });
+        let timer = null;
+        const refresh = () => {
+            // agrupa ráfagas (p.ej. un equipo entero aceptando) en un solo fetch
+            clearTimeout(timer);
+            timer = setTimeout(fetchData, 300);
+        };
+
+        es.onopen = () => {
+            // al reconectar pudimos perder eventos
+            if (streamDropped.current) refresh();
+            streamDropped.current = false;
+            setStreamLive(true);
+        };
+        es.onerror = () => {
+            streamDropped.current = true;
+            setStreamLive(false);
+        };
+        for (const type of [
+            "event_invitation",
+            "rsvp",
+            "team_invitation",
+            "friend_request",
+            "contact_accepted",
+            "resync",
+        ]) {
+            es.addEventListener(type, refresh);
+        }
+
+        return () => {
+            clearTimeout(timer);
+            es.close();
+        };
+    }, []);
+
+    useEffect(() => {
+        if (active === 0 || (!streamLive && (active === 2 || active === 3))) {
             fetchData();
         }
-    }, [active]);
+    }, [active, streamLive]);
 
     const sorted = [...events].sort(
         (a, b) =>
@@ -570,11 +641,11 @@ export default function AppHome() {
                     {/* 0: Dashboard */}
                     <section className="panel panel--scroll" ref={dashboardRef}>
                         <Dashboard
-                            apiBase={API_BASE}
-                            showToast={showToast}
                             events={sorted}
                             invites={invitesSorted}
-                            isActive={active === 0}
+                            friendRequests={friendRequests}
+                            teamInvites={teamInvites}
+                            loading={loadingData}
                         />
                     </section>
 
@@ -612,7 +683,7 @@ export default function AppHome() {
 
                     {/* 4: Calendario */}
                     <section className="panel panel--scroll">
-                        <Calendar events={forCalendar} />
+                        <Calendar events={forCalendar} apiBase={API_BASE} />
                     </section>
 
                     {/* 5: Personas */}
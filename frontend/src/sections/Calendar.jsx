@@ -1,5 +1,5 @@
 // Calendar.jsx
-import { useMemo, useState } from "react";
+import { useEffect, useMemo, useState } from "react";
 
 /** Helpers */
 function pad(n) { return String(n).padStart(2, "0"); }
@@ -19,9 +19,32 @@ function groupByDate(arr) { const out = {}; for (const e of arr) { if (!e.date)
 
 const MONTHS_ES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"];
 
-export default function Calendar({ events = [] }) {
+export default function Calendar({ events: allEvents = [], apiBase }) {
     const today = new Date();
     const [ym, setYm] = useState({ y: today.getFullYear(), m: today.getMonth() });
+    const [monthEvents, setMonthEvents] = useState(null);
+
+    // Con apiBase se pide solo el mes visible a /calendar/range;
+    // `allEvents` queda como respaldo y como señal para refrescar.
+    useEffect(() => {
+        if (!apiBase) return;
+        let cancelled = false;
+        const params = new URLSearchParams({
+            from: toISODateLocal(new Date(ym.y, ym.m, 1)),
+            to: toISODateLocal(new Date(ym.y, ym.m, daysInMonth(ym.y, ym.m))),
+            include_pending: "true",
+        });
+        fetch(`${apiBase}/calendar/range?${params}`, { credentials: "include" })
+            .then(res => (res.ok ? res.json() : Promise.reject(res.status)))
+            .then(data => { if (!cancelled) setMonthEvents(data || []); })
+            .catch(err => {
+                console.error("calendar range error:", err);
+                if (!cancelled) setMonthEvents(null);
+            });
+        return () => { cancelled = true; };
+    }, [apiBase, ym, allEvents]);
+
+    const events = monthEvents ?? allEvents;
 
     const byDate = useMemo(() => groupByDate(events), [events]);
     const cells = useMemo(() => monthMatrix(ym.y, ym.m), [ym]);
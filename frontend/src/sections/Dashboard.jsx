@@ -1,5 +1,5 @@
 // ../sections/Dashboard.jsx
-import { useEffect, useState, useMemo } from "react";
+import { useMemo } from "react";
 
 function Card({ title, children, footer }) {
     return (
@@ -55,53 +55,14 @@ function formatTime(t) {
     }
 }
 
-export default function Dashboard({ apiBase, showToast, events, invites, isActive }) {
-    const [friendRequests, setFriendRequests] = useState([]);
-    const [teamInvites, setTeamInvites] = useState([]);
-    const [loading, setLoading] = useState(false);
-
-    // Cargar solicitudes de amistad e invitaciones a equipos cuando el dashboard está activo
-    useEffect(() => {
-        if (!isActive) return;
-        let cancelled = false;
-
-        async function load() {
-            setLoading(true);
-            try {
-                const [frRes, teamRes] = await Promise.all([
-                    fetch(`${apiBase}/friend-requests/received`, {
-                        credentials: "include",
-                    }),
-                    fetch(`${apiBase}/teams/invitations`, {
-                        credentials: "include",
-                    }),
-                ]);
-
-                const [frData, teamData] = await Promise.all([
-                    frRes.ok ? frRes.json() : Promise.resolve([]),
-                    teamRes.ok ? teamRes.json() : Promise.resolve([]),
-                ]);
-
-                if (!cancelled) {
-                    setFriendRequests(frData || []);
-                    setTeamInvites(teamData || []);
-                }
-            } catch (err) {
-                console.error("Error cargando dashboard:", err);
-                if (!cancelled && showToast) {
-                    showToast("Error cargando resumen");
-                }
-            } finally {
-                if (!cancelled) setLoading(false);
-            }
-        }
-
-        load();
-        return () => {
-            cancelled = true;
-        };
-    }, [apiBase, isActive, showToast]);
-
+export default function Dashboard({
+    events,
+    invites,
+    friendRequests = [],
+    teamInvites = [],
+    loading = false,
+}) {
+    // Solicitudes de amistad e invitaciones a equipos llegan desde AppHome (/dashboard)
 
     const pendingInvites = useMemo(() => {
         const now = new Date();